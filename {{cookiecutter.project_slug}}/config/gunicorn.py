@@ -1,14 +1,116 @@
 # -*- coding: utf-8 -*-
 
+import gc
 import multiprocessing
 import os
+import shutil
 from distutils.util import strtobool
 
 bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
 accesslog = "-"
-access_log_format = "%(h)s %(l)s %(u)s %(t)s '%(r)s' %(s)s %(b)s '%(f)s' '%(a)s' in %(D)sµs"  # noqa: E501
+# Database time and query count of each request are set in the WSGI environ
+# by the app, see lib/util_instrumentation.py.
+access_log_format = "%(h)s %(l)s %(u)s %(t)s '%(r)s' %(s)s %(b)s '%(f)s' '%(a)s' in %(D)sµs db %({db.time}e)sµs/%({db.queries}e)sq"  # noqa: E501
 
+# sync serves 1 request per worker at a time, gthread 1 per thread and gevent
+# 1 per greenlet, up to worker_connections. See config/settings.py for how
+# the database pool is sized to match.
+worker_class = os.getenv("WEB_WORKER_CLASS", "sync")
 workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
 threads = int(os.getenv("PYTHON_MAX_THREADS", 1))
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 100))
+
+if worker_class == "gevent":
+    # Patch before the app (and psycopg) are imported, which happens in this
+    # process when the app is preloaded. psycopg picks how to wait on its
+    # socket at import, wait_selector goes through the patched selectors
+    # module so a query yields to other greenlets. The compiled wait function
+    # of psycopg[c] would block the whole worker instead.
+    os.environ.setdefault("PSYCOPG_WAIT_FUNC", "wait_selector")
+
+    from gevent import monkey
+
+    monkey.patch_all()
 
 reload = bool(strtobool(os.getenv("WEB_RELOAD", "false")))
+
+# Create the app once in the master and fork workers from it, so they share
+# its memory instead of each importing everything again. Code reloading needs
+# every worker to import the app itself, so it turns this off.
+preload_app = bool(strtobool(os.getenv("WEB_PRELOAD", "true"))) and not reload
+
+
+def memory_usage():
+    """
+    Read this process' resident memory and the part of it that isn't shared
+    with any other process, from /proc so it only works on Linux.
+
+    :return: dict of kB, or None when it can't be read
+    """
+    usage = {}
+
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    usage[key] = int(value.split()[0])
+    except (OSError, ValueError):
+        return None
+
+    return {
+        "rss": usage.get("Rss", 0),
+        "pss": usage.get("Pss", 0),
+        "private": usage.get("Private_Clean", 0)
+        + usage.get("Private_Dirty", 0),
+    }
+
+
+def log_memory_usage(log, pid, stage):
+    usage = memory_usage()
+
+    if usage:
+        log.info(
+            "Worker %s %s: rss %.1fMB, pss %.1fMB, private %.1fMB",
+            pid, stage, usage["rss"] / 1024, usage["pss"] / 1024,
+            usage["private"] / 1024)
+
+
+def on_starting(server):
+    # Metrics of workers from a previous run would otherwise be added up too.
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Move everything the app allocated into the permanent generation.
+        # Otherwise the garbage collector in each worker writes to those
+        # objects while scanning them, which copies their pages out of the
+        # memory shared with the master.
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from {{ cookiecutter.project_slug }}.app import dispose_connections
+
+        dispose_connections(server.app.wsgi())
+
+    log_memory_usage(server.log, worker.pid, "forked")
+
+
+def post_worker_init(worker):
+    log_memory_usage(worker.log, worker.pid, "ready")
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,9 @@
+import multiprocessing
 import os
 from distutils.util import strtobool
 
+from kombu import Queue
+
 SECRET_KEY = os.getenv("SECRET_KEY", None)
 DEBUG = bool(strtobool(os.getenv("FLASK_DEBUG", "false")))
 
@@ -8,6 +11,10 @@ SERVER_NAME = os.getenv(
     "SERVER_NAME", "localhost:{0}".format(os.getenv("PORT", "8000"))
 )
 
+# `flask digest compile` writes a .gz and .br copy of every static file, the
+# app serves whichever the browser accepts, see lib/util_static.py.
+FLASK_STATIC_DIGEST_COMPRESSION = ["gzip", "brotli"]
+
 # SQLAlchemy.
 pg_user = os.getenv("POSTGRES_USER", "postgres")
 pg_pass = os.getenv("POSTGRES_PASSWORD", "password")
@@ -19,19 +26,123 @@ SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", db)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SQLALCHEMY_RECORD_QUERIES = DEBUG
 
+# Each gunicorn worker needs at most 1 connection per thread plus 1 for the
+# background sign in activity flusher. A gevent worker serves up to
+# WEB_WORKER_CONNECTIONS requests at once, far more than it should hold
+# connections for, so its greenlets share DB_POOL_SIZE connections and wait
+# for one up to DB_POOL_TIMEOUT. DB_MAX_CONNECTIONS caps how many
+# connections every worker combined may open, keep it below Postgres'
+# max_connections minus what Celery and admin tools use. 0 means no cap.
+web_workers = int(
+    os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2)
+)
+web_worker_class = os.getenv("WEB_WORKER_CLASS", "sync")
+web_threads = int(os.getenv("PYTHON_MAX_THREADS", 1))
+
+if web_worker_class == "gevent":
+    web_worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 100))
+    db_pool_size = min(web_worker_connections, 10)
+else:
+    db_pool_size = web_threads
+
+db_pool_size = int(os.getenv("DB_POOL_SIZE", db_pool_size))
+db_max_connections = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+db_connections = db_pool_size + 1
+
+if db_max_connections:
+    db_connections = max(1, min(db_connections,
+                                db_max_connections // web_workers))
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": min(db_pool_size, db_connections),
+    "max_overflow": db_connections - min(db_pool_size, db_connections),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    # Test connections before using them so a database failover or an idle
+    # timeout doesn't surface as an error on the next request.
+    "pool_pre_ping": bool(strtobool(os.getenv("DB_POOL_PRE_PING", "true"))),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+}
+
+# PgBouncer in transaction pooling mode hands each transaction to any server
+# connection, so psycopg must not prepare statements on them.
+if bool(strtobool(os.getenv("DB_PGBOUNCER", "false"))):
+    SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {"prepare_threshold": None}
+
+# Read replicas, as comma separated database URLs. Read only queries go to
+# them round robin, a replica that fails to connect is skipped for
+# DB_REPLICA_RETRY_AFTER seconds. After writing, a request reads from the
+# primary and so does the same browser for DB_REPLICA_STICKY seconds.
+SQLALCHEMY_BINDS = {
+    f"replica_{i}": {"url": url, **SQLALCHEMY_ENGINE_OPTIONS}
+    for i, url in enumerate(os.getenv("DB_REPLICA_URLS", "").split(","))
+    if url
+}
+DB_REPLICA_RETRY_AFTER = int(os.getenv("DB_REPLICA_RETRY_AFTER", 30))
+DB_REPLICA_STICKY = int(os.getenv("DB_REPLICA_STICKY", 5))
+
+# Log statements slower than this many milliseconds, 0 disables it.
+DB_SLOW_QUERY_MS = int(os.getenv("DB_SLOW_QUERY_MS", 500))
+
 # Redis.
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
 # Celery
+# Each kind of task has its own queue so a bulk job can't hold up the emails
+# a user is waiting for. Within a queue, tasks with a lower priority number
+# run first (0 to 9, this is how Redis orders priorities).
 CELERY_CONFIG = {
     "broker_url": REDIS_URL,
+    "broker_transport_options": {
+        "queue_order_strategy": "priority",
+        "priority_steps": list(range(10)),
+        # Unacknowledged tasks are redelivered after this many seconds, it
+        # has to outlast the longest task with late acks.
+        "visibility_timeout": int(
+            os.getenv("CELERY_VISIBILITY_TIMEOUT", 3600)),
+    },
     "result_backend": REDIS_URL,
+    "task_queues": [
+        Queue("interactive"),
+        Queue("default"),
+        Queue("bulk"),
+    ],
+    "task_default_queue": "default",
+    "task_routes": {
+        "deliver_password_reset": {"queue": "interactive", "priority": 0},
+        "deliver_registration_email": {"queue": "bulk", "priority": 5},
+        "deliver_registration_emails": {"queue": "bulk", "priority": 5},
+        "prune_expired_tokens": {"queue": "default", "priority": 9},
+    },
+    # Reserve 1 task per process at a time, so long tasks don't sit on
+    # prefetched tasks that another process could be running.
+    "worker_prefetch_multiplier": int(
+        os.getenv("CELERY_PREFETCH_MULTIPLIER", 1)),
     "include": [
         "{{ cookiecutter.project_slug }}.blueprints.user.tasks",
         "{{ cookiecutter.project_slug }}.blueprints.invite.tasks",
-    ]
+        "{{ cookiecutter.project_slug }}.blueprints.token.tasks",
+    ],
+    # The worker serves its task metrics on this port, 0 disables it.
+    "worker_metrics_port": int(os.getenv("CELERY_METRICS_PORT", 9808)),
+    "beat_schedule": {
+        "prune-expired-tokens": {
+            "task": "prune_expired_tokens",
+            "schedule": 3600,
+        },
+    },
 }
 
+# Metrics
+# How often (in seconds) each worker copies its DB pool, cache and password
+# stats into the metrics served on /metrics.
+METRICS_SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL", 1))
+
+# Health checks
+# /up/ready caches each dependency's result for this many seconds per worker
+# and gives up on a dependency after UP_READY_TIMEOUT seconds.
+UP_READY_TTL = float(os.getenv("UP_READY_TTL", 5))
+UP_READY_TIMEOUT = float(os.getenv("UP_READY_TIMEOUT", 2))
+
 # Seeds
 SEED_ADMIN_EMAIL = str(os.getenv("SEED_ADMIN_EMAIL"))
 SEED_ADMIN_PASSWORD = str(os.getenv("SEED_ADMIN_PASSWORD"))
@@ -40,6 +151,10 @@ SEED_MEMBER_PASSWORD = str(os.getenv("SEED_MEMBER_PASSWORD"))
 
 # JWT
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt_secret")
+JWT_KEY_ID = os.getenv("JWT_KEY_ID", "1")
+# Retired keys that still verify the tokens they signed, "kid:secret,...".
+JWT_PREVIOUS_KEYS = os.getenv("JWT_PREVIOUS_KEYS", "")
+JWT_CACHE_MAXSIZE = int(os.getenv("JWT_CACHE_MAXSIZE", 4096))
 ACCESS_TOKEN_EXP = int(os.getenv("ACCESS_TOKEN_EXP", 15))
 REFRESH_TOKEN_EXP = int(os.getenv("REFRESH_TOKEN_EXP ", 7))
 
@@ -49,6 +164,18 @@ APIFAIRY_VERSION = "0.1.0"
 APIFAIRY_UI = os.environ.get("DOCS_UI", "redoc")
 APIFAIRY_TAGS = ["user"]
 
+# API pagination
+API_PAGE_LIMIT = int(os.getenv("API_PAGE_LIMIT", 25))
+API_PAGE_MAX_LIMIT = int(os.getenv("API_PAGE_MAX_LIMIT", 100))
+
+# How long API clients may reuse a response before revalidating it with its
+# ETag, 0 revalidates every time.
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", 0))
+
+# Invites
+# Most emails a single /api/invites/bulk request can invite.
+INVITE_BULK_MAX_EMAILS = int(os.getenv("INVITE_BULK_MAX_EMAILS", 10000))
+
 # Flask-Mail
 MAIL_SERVER = os.getenv("MAIL_SERVER", "sandbox.smtp.mailtrap.io")
 MAIL_PORT = os.getenv("MAIL_PORT", 2525)
@@ -57,12 +184,40 @@ MAIL_USERNAME = os.getenv("MAIL_USERNAME")
 MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
 MAIL_USE_TLS = bool(strtobool(os.getenv("MAIL_USE_TLS", "true")))
 MAIL_USE_SSL = bool(strtobool(os.getenv("MAIL_USE_SSL", "false")))
+# Each worker keeps its SMTP connection open this many seconds after it was
+# last used, and sends at most MAIL_RATE_LIMIT messages per second (0 means
+# no limit).
+MAIL_KEEPALIVE = float(os.getenv("MAIL_KEEPALIVE", 30))
+MAIL_RATE_LIMIT = float(os.getenv("MAIL_RATE_LIMIT", 0))
 
 # DebugToolbar
 DEBUG_TB_INTERCEPT_REDIRECTS = False
 
 # User
-USER_UNUSABLE_PASSWORD = os.getenv("USER_UNUSABLE_PASSWORD")
+# Any Werkzeug hash method, such as "pbkdf2:sha256:600000" or
+# "scrypt:32768:8:1". Existing hashes are upgraded on the user's next login.
+PASSWORD_HASH_METHOD = os.getenv(
+    "PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000"
+)
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+# Verify passwords in a bounded thread pool per worker, 0 verifies inline.
+# Logins beyond the pool plus its queue are answered with a 503 right away.
+PASSWORD_VERIFY_POOL_SIZE = int(os.getenv("PASSWORD_VERIFY_POOL_SIZE", 0))
+PASSWORD_VERIFY_QUEUE_SIZE = int(os.getenv("PASSWORD_VERIFY_QUEUE_SIZE", 4))
+
+# Sign in activity is either written on every login ("sync") or coalesced per
+# user and written in bulk by a background thread ("buffered").
+USER_ACTIVITY_TRACKING = os.getenv("USER_ACTIVITY_TRACKING", "buffered")
+USER_ACTIVITY_FLUSH_INTERVAL = float(
+    os.getenv("USER_ACTIVITY_FLUSH_INTERVAL", 5)
+)
+USER_ACTIVITY_MAX_BATCH = int(os.getenv("USER_ACTIVITY_MAX_BATCH", 500))
+
+# User identity cache used by Flask-Login's user loader. A TTL of 0 disables
+# it, USER_CACHE_REDIS shares cached users between workers through Redis.
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", 1024))
+USER_CACHE_REDIS = bool(strtobool(os.getenv("USER_CACHE_REDIS", "false")))
 
 # Billing
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
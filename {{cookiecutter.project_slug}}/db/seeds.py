@@ -1,7 +1,5 @@
 from flask import current_app
 
-from werkzeug.security import generate_password_hash
-
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 
 app_config = current_app.config
@@ -12,13 +10,13 @@ if User.find_by_email(app_config["SEED_ADMIN_EMAIL"]) is None:
         "role": "admin",
         "name": "Admin User",
         "email": app_config["SEED_ADMIN_EMAIL"],
-        "password": generate_password_hash(app_config["SEED_ADMIN_PASSWORD"]),
+        "password": User.encrypt_password(app_config["SEED_ADMIN_PASSWORD"]),
     }
 
     User(**params).save()
 
 if User.find_by_email(app_config["SEED_MEMBER_EMAIL"]) is None:
-    passwd = generate_password_hash(app_config["SEED_MEMBER_PASSWORD"])
+    passwd = User.encrypt_password(app_config["SEED_MEMBER_PASSWORD"])
     params = {
         "role": "member",
         "name": "Member User",
@@ -0,0 +1,78 @@
+"""hash refresh tokens
+
+Revision ID: 1b4d7e2a9c3f
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision = "1b4d7e2a9c3f"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("tokens", sa.Column("token_hash", sa.String(64)))
+    op.add_column("tokens", sa.Column("family_id", UUID(as_uuid=True)))
+    op.add_column("tokens",
+                  sa.Column("revoked_on", sa.DateTime(timezone=True)))
+
+    # Identical tokens issued within the same second would share a digest.
+    op.execute(
+        "DELETE FROM tokens a USING tokens b "
+        "WHERE a.token = b.token AND a.id > b.id"
+    )
+
+    # Refresh tokens issued so far carry no "type" claim, so they can never
+    # be exchanged for a new pair. They're hashed like new tokens are, then
+    # revoked, and their raw value is dropped with the column. Each token is
+    # its own family.
+    op.execute(
+        "UPDATE tokens SET "
+        "token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        "family_id = id, "
+        "revoked_on = now()"
+    )
+
+    op.alter_column("tokens", "token_hash", nullable=False)
+    op.alter_column("tokens", "family_id", nullable=False)
+
+    # Expirations were written in UTC.
+    op.alter_column(
+        "tokens", "token_expiration",
+        type_=sa.DateTime(timezone=True),
+        postgresql_using="token_expiration AT TIME ZONE 'UTC'",
+    )
+
+    op.drop_column("tokens", "token")
+
+    op.create_index("ix_tokens_token_hash", "tokens", ["token_hash"],
+                    unique=True)
+    op.create_index("ix_tokens_family_id", "tokens", ["family_id"])
+    op.create_index("ix_tokens_token_expiration", "tokens",
+                    ["token_expiration"])
+
+
+def downgrade():
+    op.drop_index("ix_tokens_token_expiration", table_name="tokens")
+    op.drop_index("ix_tokens_family_id", table_name="tokens")
+    op.drop_index("ix_tokens_token_hash", table_name="tokens")
+
+    # Only digests were stored, so no token survives going back.
+    op.execute("DELETE FROM tokens")
+
+    op.add_column("tokens", sa.Column("token", sa.Text(), nullable=False))
+    op.alter_column(
+        "tokens", "token_expiration",
+        type_=sa.DateTime(),
+        postgresql_using="token_expiration AT TIME ZONE 'UTC'",
+    )
+    op.drop_column("tokens", "revoked_on")
+    op.drop_column("tokens", "family_id")
+    op.drop_column("tokens", "token_hash")
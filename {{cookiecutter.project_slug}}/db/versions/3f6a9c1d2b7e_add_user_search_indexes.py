@@ -0,0 +1,38 @@
+"""add user search indexes
+
+Revision ID: 3f6a9c1d2b7e
+Revises: 1b4d7e2a9c3f
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6a9c1d2b7e"
+down_revision = "1b4d7e2a9c3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Build the indexes without locking writes to the users table, which
+    # can't happen inside a transaction. `flask db reset` already creates
+    # them from the model, hence IF NOT EXISTS.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm "
+            "ON users USING gin (email gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm "
+            "ON users USING gin (name gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_name_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email_trgm")
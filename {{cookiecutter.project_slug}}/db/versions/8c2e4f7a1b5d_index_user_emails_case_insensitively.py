@@ -0,0 +1,38 @@
+"""index user emails case insensitively
+
+Revision ID: 8c2e4f7a1b5d
+Revises: 3f6a9c1d2b7e
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "8c2e4f7a1b5d"
+down_revision = "3f6a9c1d2b7e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Building the unique index fails if 2 users that aren't soft deleted
+    # have the same email in a different case, merge or remove 1 of them
+    # first. The old index is only dropped once the new one is in place.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "
+            "uq_users_email_lower ON users (lower(email)) "
+            "WHERE is_removed IS false"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email")
+
+
+def downgrade():
+    # This fails if a removed user's email was reused since the upgrade.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email "
+            "ON users (email)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_users_email_lower")
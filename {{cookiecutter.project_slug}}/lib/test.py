@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from flask import url_for
 
@@ -67,3 +69,19 @@ def logout(client):
     :return: Flask response
     """
     return client.get(url_for("user.logout"), follow_redirects=True)
+
+
+def wait_for(condition, timeout=5):
+    """
+    Poll a condition until it's true.
+
+    :param condition: Callable returning a bool
+    :param timeout: Seconds to wait before failing
+    :type timeout: float
+    :return: None
+    """
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting"
+        time.sleep(0.01)
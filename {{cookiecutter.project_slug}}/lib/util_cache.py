@@ -0,0 +1,197 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+
+class LRUCache(object):
+    """
+    Thread safe, in-process least recently used cache where every entry
+    expires after a time to live. Hits and misses are counted so callers can
+    report how effective the cache is.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return a cached value, counting the lookup as a hit or a miss.
+
+        :param key: Cache key
+        :param default: Value returned when the key is missing or expired
+        :return: Cached value or default
+        """
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is not None:
+                value, expires_at = item
+
+                if expires_at > self.timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._data[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        :param key: Cache key
+        :param value: Value to cache
+        :param ttl: Seconds until the entry expires, defaults to self.ttl
+        :return: None
+        """
+        ttl = self.ttl if ttl is None else ttl
+
+        if self.maxsize <= 0 or ttl <= 0:
+            return None
+
+        with self._lock:
+            self._data[key] = (value, self.timer() + ttl)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+        return None
+
+    def delete(self, *keys):
+        """
+        Remove 1 or more keys from the cache.
+
+        :param keys: Cache keys
+        :return: None
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+        return None
+
+    def clear(self):
+        """
+        Remove every entry and reset the hit and miss counters.
+
+        :return: None
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+        return None
+
+    def stats(self):
+        """
+        Report how the cache is performing.
+
+        :return: dict
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache(object):
+    """
+    Shared cache tier stored in Redis. Values are pickled, so only use this
+    with a Redis server you trust. Connection errors are treated as misses so
+    an unavailable Redis never takes the application down with it.
+    """
+
+    def __init__(self, client, prefix, ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get(self, key, default=None):
+        """
+        Return a cached value, counting the lookup as a hit or a miss.
+
+        :param key: Cache key
+        :param default: Value returned when the key is missing
+        :return: Cached value or default
+        """
+        try:
+            value = self.client.get(self._key(key))
+        except RedisError:
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+
+        :param key: Cache key
+        :param value: Value to cache
+        :param ttl: Seconds until the entry expires, defaults to self.ttl
+        :return: None
+        """
+        ttl = self.ttl if ttl is None else ttl
+
+        if ttl <= 0:
+            return None
+
+        try:
+            self.client.set(self._key(key), pickle.dumps(value), ex=ttl)
+        except RedisError:
+            pass
+
+        return None
+
+    def delete(self, *keys):
+        """
+        Remove 1 or more keys from the cache.
+
+        :param keys: Cache keys
+        :return: None
+        """
+        if not keys:
+            return None
+
+        try:
+            self.client.delete(*[self._key(key) for key in keys])
+        except RedisError:
+            pass
+
+        return None
+
+    def stats(self):
+        """
+        Report how the cache is performing.
+
+        :return: dict
+        """
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,82 @@
+import hashlib
+
+from flask import Response, abort, after_this_request, request
+
+
+def weak_etag(*parts):
+    """
+    Hash whatever identifies a version of a resource, such as its id and when
+    it was last updated, into an ETag.
+
+    :param parts: Values which change whenever the resource does
+    :return: str
+    """
+    version = "|".join(str(part) for part in parts)
+
+    return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+
+class ConditionalGet(object):
+    """
+    Answer API requests for data the client already has with a 304 Not
+    Modified, as soon as the view knows which version it's about to send.
+    Raising the 304 skips serializing the response, which costs more than
+    the query that found the version.
+
+    Responses are private to the authenticated user and may be reused for
+    API_CACHE_MAX_AGE seconds before being revalidated. 0 revalidates every
+    request, which suits clients polling for changes.
+    """
+
+    def __init__(self, app=None):
+        self.max_age = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read the max age from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.max_age = app.config.get("API_CACHE_MAX_AGE", 0)
+
+        app.extensions["conditional_get"] = self
+
+        return None
+
+    def check(self, *parts):
+        """
+        Tag the current response with a weak ETag of `parts`. When the
+        request's If-None-Match already has it, stop the view and answer with
+        a 304 instead.
+
+        :param parts: Values which change whenever the resource does
+        :return: ETag
+        """
+        etag = weak_etag(*parts)
+
+        if request.method in ("GET", "HEAD") \
+                and request.if_none_match.contains_weak(etag):
+            abort(self._tag(Response(status=304), etag))
+
+        @after_this_request
+        def tag_response(response):
+            if response.status_code == 200:
+                self._tag(response, etag)
+
+            return response
+
+        return etag
+
+    def _tag(self, response, etag):
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.max_age = self.max_age
+
+        return response
+
+
+conditional_get = ConditionalGet()
@@ -0,0 +1,62 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+
+    if isinstance(value, uuid.UUID):
+        return str(value)
+
+    return value
+
+
+def render_export(result, fields, fmt="ndjson"):
+    """
+    Render a streamed result as NDJSON or CSV, 1 chunk per partition of rows.
+    Nothing but the current partition is ever held in memory, so this works
+    for tables of any size when the result was executed with `yield_per`.
+
+    :param result: SQLAlchemy result executed with `yield_per`
+    :param fields: Names of the selected columns, in order
+    :type fields: list
+    :param fmt: Either ndjson or csv
+    :type fmt: str
+    :return: Generator of str
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+
+        for partition in result.partitions():
+            for row in partition:
+                writer.writerow([_serialize(value) for value in row])
+
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        # An empty result still gets its header.
+        if buffer.getvalue():
+            yield buffer.getvalue()
+
+        return
+
+    for partition in result.partitions():
+        yield "".join(
+            json.dumps(dict(zip(fields, map(_serialize, row)))) + "\n"
+            for row in partition
+        )
@@ -0,0 +1,119 @@
+import re
+import time
+
+from flask import current_app, g, has_app_context, has_request_context
+from flask import request
+from sqlalchemy import event
+
+# Applied in order to turn a statement into a fingerprint shared by every
+# execution of the same query, whatever its parameters are.
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|%s|\$\d+"), "?"),
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(statement):
+    """
+    Normalize a SQL statement by replacing its literals and parameters, and
+    collapsing lists of them, so similar queries can be grouped.
+
+    :param statement: SQL statement
+    :type statement: str
+    :return: str
+    """
+    for pattern, replacement in FINGERPRINT_RULES:
+        statement = pattern.sub(replacement, statement)
+
+    return statement.strip()
+
+
+class QueryInstrumentation(object):
+    """
+    Count the queries and database time of every request and Celery task
+    (anything running in an app context) through engine events.
+
+    Statements slower than DB_SLOW_QUERY_MS are logged with the endpoint or
+    task that ran them. Each request's totals are also put in the WSGI
+    environ as "db.queries" and "db.time" (in µs) for gunicorn's access log.
+    """
+
+    def __init__(self, app=None):
+        self.slow_query_ms = 500
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Listen to the app's engines and record each request's totals.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.slow_query_ms = app.config.get("DB_SLOW_QUERY_MS", 500)
+
+        app.extensions["query_instrumentation"] = self
+
+        with app.app_context():
+            engines = app.extensions["sqlalchemy"].engines
+
+            for engine in engines.values():
+                event.listen(engine, "before_cursor_execute",
+                             self._before_execute)
+                event.listen(engine, "after_cursor_execute",
+                             self._after_execute)
+
+        @app.teardown_request
+        def record_db_time(exception=None):
+            queries, duration = self.totals()
+            request.environ["db.queries"] = queries
+            request.environ["db.time"] = int(duration * 1000000)
+
+        return None
+
+    def totals(self):
+        """
+        Return the current app context's query count and database time.
+
+        :return: tuple of (queries, seconds)
+        """
+        return g.get("db_queries", 0), g.get("db_time", 0.0)
+
+    def scope(self):
+        """
+        Name what the current app context is running.
+
+        :return: Endpoint, Celery task name or "app"
+        """
+        if has_request_context():
+            return request.endpoint or request.path
+
+        return g.get("task_name", "app")
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        context._query_started_at = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        duration = time.perf_counter() - context._query_started_at
+
+        if not has_app_context():
+            return None
+
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + duration
+
+        if self.slow_query_ms and duration * 1000 >= self.slow_query_ms:
+            current_app.logger.warning(
+                "Slow query (%.1fms) in %s: %s",
+                duration * 1000, self.scope(), fingerprint(statement))
+
+        return None
+
+
+query_instrumentation = QueryInstrumentation()
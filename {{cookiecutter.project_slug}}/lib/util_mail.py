@@ -0,0 +1,191 @@
+import os
+import smtplib
+import threading
+import time
+
+from flask import current_app
+from flask_mail import Message
+
+# Errors which mean the connection is unusable, rather than the message
+# being rejected, so sending again over a new connection can succeed.
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class MailDelivery(object):
+    """
+    Send mail through Flask-Mail over 1 SMTP connection per process instead
+    of a new connection (and TLS handshake) per message.
+
+    Messages sent while the connection is busy wait for it and go out over
+    it in turn. Once no message was sent for MAIL_KEEPALIVE seconds the
+    connection is replaced before the next send, since servers drop idle
+    connections. A connection that fails while sending is replaced and the
+    message is sent once more.
+
+    MAIL_RATE_LIMIT caps how many messages per second each process sends,
+    0 doesn't limit it.
+    """
+
+    def __init__(self, app=None):
+        self.keepalive = 30
+        self.rate_limit = 0
+
+        self.sent = 0
+        self.connects = 0
+
+        self._connection = None
+        self._used_at = 0.0
+        self._next_send_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read the keepalive and rate limit from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.keepalive = app.config.get("MAIL_KEEPALIVE", 30)
+        self.rate_limit = app.config.get("MAIL_RATE_LIMIT", 0)
+
+        app.extensions["mail_delivery"] = self
+
+        return None
+
+    def send(self, message):
+        """
+        Send 1 message.
+
+        :param message: Flask-Mail message
+        :return: None
+        """
+        self.send_many([message])
+
+        return None
+
+    def send_many(self, messages):
+        """
+        Send messages one after another over the pooled connection.
+
+        :param messages: Flask-Mail messages
+        :type messages: list
+        :return: Number of messages sent
+        """
+        with self._lock:
+            for message in messages:
+                self._throttle()
+
+                try:
+                    self._connect().send(message)
+                except CONNECTION_ERRORS:
+                    self._disconnect()
+                    self._connect().send(message)
+
+                self._used_at = time.monotonic()
+                self.sent += 1
+
+        return len(messages)
+
+    def close(self):
+        """
+        Close the pooled connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._disconnect()
+
+        return None
+
+    def _connect(self):
+        # A connection inherited through a fork is shared with the parent,
+        # it's dropped without saying QUIT over it.
+        if self._pid != os.getpid():
+            self._connection = None
+            self._pid = os.getpid()
+
+        if self._connection is not None \
+                and time.monotonic() - self._used_at > self.keepalive:
+            self._disconnect()
+
+        if self._connection is None:
+            state = current_app.extensions["mail"]
+            connection = state.connect()
+            connection.host = None if state.suppress \
+                else connection.configure_host()
+            connection.num_emails = 0
+
+            self._connection = connection
+            self._used_at = time.monotonic()
+            self.connects += 1
+
+        return self._connection
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+
+        if connection is None or connection.host is None:
+            return None
+
+        try:
+            connection.host.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.host.close()
+
+        return None
+
+    def _throttle(self):
+        if not self.rate_limit:
+            return None
+
+        now = time.monotonic()
+
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+
+        self._next_send_at = max(now, self._next_send_at) \
+            + 1.0 / self.rate_limit
+
+        return None
+
+
+mail_delivery = MailDelivery()
+
+
+def text_email(subject, sender, recipient, text_body):
+    """
+    Build a plain text email.
+
+    :param subject: Subject
+    :type subject: str
+    :param sender: Sender's address
+    :type sender: str
+    :param recipient: Recipient's address
+    :type recipient: str
+    :param text_body: Body
+    :type text_body: str
+    :return: Flask-Mail message
+    """
+    message = Message(subject, sender=sender, recipients=[recipient])
+    message.body = text_body
+
+    return message
+
+
+def send_email(subject, sender, recipient, text_body):
+    """
+    Send a plain text email through `mail_delivery`, see `text_email`.
+
+    :return: None
+    """
+    return mail_delivery.send(
+        text_email(subject, sender, recipient, text_body))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats(object):
+    """
+    Aggregate how long connection checkouts wait on a full pool. A growing
+    wait means requests queue for connections rather than for the database,
+    so the pool (or DB_MAX_CONNECTIONS) is sized too small.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+        self._lock = threading.Lock()
+
+    def record(self, wait, timed_out=False):
+        """
+        Count a checkout.
+
+        :param wait: Seconds spent waiting for a connection
+        :type wait: float
+        :param timed_out: Whether or not the checkout gave up
+        :type timed_out: bool
+        :return: None
+        """
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+            self.wait_sum += wait
+            self.wait_max = max(self.wait_max, wait)
+
+        return None
+
+    def stats(self, pool=None):
+        """
+        Report checkout wait times, and the pool's usage when given one.
+
+        :param pool: SQLAlchemy pool, usually db.engine.pool
+        :return: dict
+        """
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg": self.wait_sum / max(waits, 1),
+                "wait_total": self.wait_sum,
+                "wait_max": self.wait_max,
+            }
+
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool which records every checkout's wait into `pool_stats`.
+    """
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+
+        try:
+            connection = super(TimedQueuePool, self)._do_get()
+        except TimeoutError:
+            pool_stats.record(time.perf_counter() - started_at, True)
+            raise
+
+        pool_stats.record(time.perf_counter() - started_at)
+
+        return connection
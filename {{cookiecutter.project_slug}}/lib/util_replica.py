@@ -0,0 +1,162 @@
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.selectable import Select
+
+
+class ReplicaSet(object):
+    """
+    Replica binds of 1 app, handed out round robin. A replica which fails to
+    connect is skipped for `retry_after` seconds.
+    """
+
+    def __init__(self, bind_keys, retry_after=30):
+        self.bind_keys = bind_keys
+        self.retry_after = retry_after
+        self.down_until = {}
+
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """
+        Pick the next healthy replica.
+
+        :return: Bind key, or None when every replica is down
+        """
+        now = time.monotonic()
+        start = next(self._turn)
+
+        for i in range(len(self.bind_keys)):
+            bind_key = self.bind_keys[(start + i) % len(self.bind_keys)]
+
+            if self.down_until.get(bind_key, 0) <= now:
+                return bind_key
+
+        return None
+
+    def mark_down(self, bind_key):
+        """
+        Stop sending reads to a replica for a while.
+
+        :param bind_key: Bind key of the replica
+        :type bind_key: str
+        :return: None
+        """
+        with self._lock:
+            self.down_until[bind_key] = time.monotonic() + self.retry_after
+
+        return None
+
+
+class ReplicaRouter(object):
+    """
+    Send read only queries to the replica binds (any SQLALCHEMY_BINDS key
+    starting with "replica") and everything else to the primary.
+
+    Once an app context writes, it sticks to the primary so it reads its own
+    writes. A browser also sticks to the primary for DB_REPLICA_STICKY
+    seconds after a request wrote, which covers the usual redirect after a
+    form post while replicas catch up.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Watch the app's replicas for connection errors and register the
+        sticky session hooks, this is a no-op without replicas.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        binds = app.config.get("SQLALCHEMY_BINDS", {})
+        bind_keys = sorted(key for key in binds if key.startswith("replica"))
+
+        if not bind_keys:
+            return None
+
+        replicas = ReplicaSet(
+            bind_keys, app.config.get("DB_REPLICA_RETRY_AFTER", 30))
+        app.extensions["replica_router"] = replicas
+
+        with app.app_context():
+            engines = app.extensions["sqlalchemy"].engines
+
+            for bind_key in bind_keys:
+                event.listen(engines[bind_key], "handle_error",
+                             self._on_error(replicas, bind_key))
+
+        sticky = app.config.get("DB_REPLICA_STICKY", 5)
+
+        @app.before_request
+        def stick_to_primary():
+            if session.get("db_primary_until", 0) > time.time():
+                g.db_primary = True
+
+        @app.after_request
+        def remember_write(response):
+            if g.get("db_wrote") and sticky:
+                session["db_primary_until"] = time.time() + sticky
+
+            return response
+
+        return None
+
+    def get_bind_key(self, clause):
+        """
+        Pick a replica for a statement, or None for the primary.
+
+        :param clause: Statement being executed, None when flushing
+        :return: Bind key or None
+        """
+        if not has_app_context():
+            return None
+
+        replicas = current_app.extensions.get("replica_router")
+
+        if replicas is None:
+            return None
+
+        if not isinstance(clause, Select) or clause._for_update_arg:
+            g.db_primary = g.db_wrote = True
+            return None
+
+        if g.get("db_primary"):
+            return None
+
+        return replicas.choose()
+
+    @staticmethod
+    def _on_error(replicas, bind_key):
+        def handle_error(context):
+            # A connection that couldn't be made or was dropped.
+            if context.is_disconnect or context.connection is None:
+                replicas.mark_down(bind_key)
+
+        return handle_error
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """
+    Session which lets `replica_router` pick the engine of each statement.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            bind_key = replica_router.get_bind_key(clause)
+
+            if bind_key is not None:
+                return self._db.engines[bind_key]
+
+        return super(RoutingSession, self).get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -1,3 +1,5 @@
+from marshmallow import ValidationError, validate, validates_schema
+
 from {{ cookiecutter.project_slug }}.extensions import marshmallow as ma
 
 
@@ -7,3 +9,40 @@ class MessageSchema(ma.Schema):
 
 
 api_message_schema = MessageSchema()
+
+
+class PaginationSchema(ma.Schema):
+    limit = ma.Integer()
+    next_cursor = ma.String(allow_none=True)
+
+
+class PaginationArgsSchema(ma.Schema):
+    """
+    Query string arguments of a keyset paginated collection. Subclasses set
+    `model` to a `ResourceMixin` model so cursors are validated up front, and
+    may add a `q` search query whose results are paginated by rank.
+    """
+    model = None
+
+    cursor = ma.String()
+    limit = ma.Integer(validate=[validate.Range(min=1)])
+    sort = ma.String(load_default="created_on")
+    direction = ma.String(
+        load_default="desc", validate=[validate.OneOf(["asc", "desc"])])
+
+    @validates_schema
+    def validate_cursor(self, data, **kwargs):
+        if self.model is None or not data.get("cursor"):
+            return
+
+        if data.get("q"):
+            # Search results are always ranked from the best match down.
+            field, direction = "rank", "desc"
+        else:
+            field, direction = self.model.sort_by(
+                data["sort"], data["direction"])
+
+        try:
+            self.model.decode_cursor(data["cursor"], field, direction)
+        except ValueError as error:
+            raise ValidationError(str(error), "cursor")
@@ -1,8 +1,13 @@
+import base64
 import datetime
+import json
+import uuid
 
-from sqlalchemy import DateTime
+from sqlalchemy import DateTime, Float, and_, delete, event, func, literal
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import Session, with_loader_criteria
 from sqlalchemy.types import TypeDecorator
-from flask_sqlalchemy import BaseQuery
+from flask_sqlalchemy.query import Query
 
 from lib.util_datetime import tzware_datetime
 from {{ cookiecutter.project_slug }}.extensions import db
@@ -16,6 +21,7 @@ class AwareDateTime(TypeDecorator):
       https://gist.github.com/inklesspen/90b554c864b99340747e
     """
     impl = DateTime(timezone=True)
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if isinstance(value, datetime.datetime) and value.tzinfo is None:
@@ -54,9 +60,172 @@ class ResourceMixin(object):
         return field, direction
 
     @classmethod
-    def get_bulk_action_ids(cls, scope, ids, omit_ids=[], query=''):
+    def watermark(cls, query):
         """
-        Determine which IDs are to be modified.
+        Summarize a query's rows as when the last of them was updated and how
+        many there are. It changes whenever a row is added, updated or
+        deleted, without fetching any of them.
+
+        :param query: Query to summarize
+        :type query: SQLAlchemy query
+        :return: tuple of (latest updated_on, count)
+        """
+        latest, count = query.order_by(None).with_entities(
+            func.max(cls.updated_on), func.count()).one()
+
+        return latest, count
+
+    @classmethod
+    def paginate_keyset(cls, query, cursor=None, limit=25,
+                        sort="created_on", direction="desc"):
+        """
+        Paginate a query with a keyset on the sort column and the id. Unlike
+        OFFSET this seeks straight to the next page through an index, so every
+        page is as fast as the first one. Sort on columns that are never null.
+
+        :param query: Query to paginate, it must not be ordered yet
+        :type query: SQLAlchemy query
+        :param cursor: Opaque cursor returned with the previous page
+        :type cursor: str
+        :param limit: Max amount of items on a page
+        :type limit: int
+        :param sort: Field to sort by, validated with `sort_by`
+        :type sort: str
+        :param direction: Direction
+        :type direction: str
+        :raises: ValueError if the cursor is invalid
+        :return: tuple of (items, next cursor or None)
+        """
+        field, direction = cls.sort_by(sort, direction)
+        column = cls.__table__.c[field]
+        pk = cls.__table__.c.id
+        keyset = tuple_(column, pk)
+
+        if cursor:
+            value, last_id = cls.decode_cursor(cursor, field, direction)
+            bound = tuple_(
+                literal(value, column.type), literal(last_id, pk.type))
+            query = query.filter(
+                keyset < bound if direction == "desc" else keyset > bound)
+
+        if direction == "desc":
+            query = query.order_by(column.desc(), pk.desc())
+        else:
+            query = query.order_by(column.asc(), pk.asc())
+
+        # Fetch 1 extra item to know whether or not there's a next page.
+        items = query.limit(limit + 1).all()
+        next_cursor = None
+
+        if len(items) > limit:
+            items = items[:limit]
+            key = cls.__mapper__.get_property_by_column(column).key
+            next_cursor = cls.encode_cursor(
+                field, direction, getattr(items[-1], key), items[-1].id)
+
+        return items, next_cursor
+
+    @classmethod
+    def paginate_ranked(cls, query, rank, cursor=None, limit=25):
+        """
+        Paginate search results from the best to the worst match with a
+        keyset on the rank and the id, see `paginate_keyset`.
+
+        :param query: Query to paginate, it must not be ordered yet
+        :type query: SQLAlchemy query
+        :param rank: Expression ranking each item, higher is better
+        :type rank: SQLAlchemy expression
+        :param cursor: Opaque cursor returned with the previous page
+        :type cursor: str
+        :param limit: Max amount of items on a page
+        :type limit: int
+        :raises: ValueError if the cursor is invalid
+        :return: tuple of (items, next cursor or None)
+        """
+        pk = cls.__table__.c.id
+        keyset = tuple_(rank, pk)
+
+        if cursor:
+            value, last_id = cls.decode_cursor(cursor, "rank", "desc")
+            bound = tuple_(literal(value, Float), literal(last_id, pk.type))
+            query = query.filter(keyset < bound)
+
+        rows = (
+            query.add_columns(rank)
+            .order_by(rank.desc(), pk.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            item, value = rows[-1]
+            next_cursor = cls.encode_cursor("rank", "desc", value, item.id)
+
+        return [row[0] for row in rows], next_cursor
+
+    @classmethod
+    def encode_cursor(cls, field, direction, value, id):
+        """
+        Create an opaque cursor pointing after a specific item.
+
+        :param field: Sort field
+        :type field: str
+        :param direction: Sort direction
+        :type direction: str
+        :param value: The item's value of the sort field
+        :param id: The item's id
+        :return: str
+        """
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+
+        data = json.dumps([field, direction, value, str(id)])
+
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def decode_cursor(cls, cursor, field, direction):
+        """
+        Read a cursor created by `encode_cursor` for the same sort.
+
+        :param cursor: str
+        :param field: Sort field the cursor must have been created for
+        :type field: str
+        :param direction: Sort direction the cursor must have been created for
+        :type direction: str
+        :raises: ValueError if the cursor is invalid
+        :return: tuple of (sort value, id)
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor.encode("ascii"))
+            cursor_field, cursor_direction, value, id = json.loads(data)
+        except (TypeError, ValueError, UnicodeError):
+            raise ValueError("Invalid cursor")
+
+        if (cursor_field, cursor_direction) != (field, direction):
+            raise ValueError("Cursor was created for another sort")
+
+        # Unwrap type decorators such as AwareDateTime, a search rank isn't
+        # a column and is already a number.
+        if field in cls.__table__.c:
+            column_type = cls.__table__.c[field].type
+            column_type = getattr(column_type, "impl", column_type)
+
+            if value is not None and isinstance(column_type, DateTime):
+                value = datetime.datetime.fromisoformat(value)
+
+        if getattr(cls.__table__.c.id.type, "as_uuid", False):
+            id = uuid.UUID(id)
+
+        return value, id
+
+    @classmethod
+    def get_bulk_action_filter(cls, scope, ids, omit_ids=[], query=''):
+        """
+        Determine which items are to be modified, as a SQL filter so the ids
+        of all search results never have to be loaded.
 
         :param scope: Affect all or only a subset of items
         :type scope: str
@@ -66,39 +235,111 @@ class ResourceMixin(object):
         :type omit_ids: list
         :param query: Search query (if applicable)
         :type query: str
-        :return: list
+        :return: SQLAlchemy filter
         """
-        omit_ids = map(str, omit_ids)
-
         if scope == 'all_search_results':
             # Change the scope to go from selected ids to all search results.
-            ids = cls.query.with_entities(cls.id).filter(cls.search(query))
-
-            # SQLAlchemy returns back a list of tuples, we want a list of strs.
-            ids = [str(item[0]) for item in ids]
+            criteria = cls.search(query)
+        else:
+            criteria = cls.id.in_(ids)
 
-        # Remove 1 or more items from the list, this could be useful in spots
+        # Remove 1 or more items from the scope, this could be useful in spots
         # where you may want to protect the current user from deleting themself
         # when bulk deleting user accounts.
         if omit_ids:
-            ids = [id for id in ids if id not in omit_ids]
+            criteria = and_(criteria, cls.id.not_in(omit_ids))
 
-        return ids
+        return criteria
 
     @classmethod
-    def bulk_delete(cls, ids):
+    def bulk_execute(cls, statement, criteria, batch_size=1000):
         """
-        Delete 1 or more model instances.
+        Run an UPDATE or DELETE on every item matching a filter. Items are
+        affected in batches of ids, 1 transaction each, so locks are only
+        held briefly and no id list is ever sent from Python.
+
+        :param statement: UPDATE or DELETE of the model
+        :type statement: SQLAlchemy statement
+        :param criteria: Filter of the items to affect
+        :type criteria: SQLAlchemy filter
+        :param batch_size: Max amount of items affected per transaction
+        :type batch_size: int
+        :return: Number of affected items
+        """
+        pk = cls.id
+        affected_count = 0
+        last_id = None
+
+        while True:
+            batch = select(pk).where(criteria)
+
+            # Seek past the previous batch in case the statement doesn't
+            # make items stop matching the filter.
+            if last_id is not None:
+                batch = batch.where(pk > last_id)
+
+            batch = batch.order_by(pk).limit(batch_size).scalar_subquery()
+            ids = db.session.execute(
+                statement.where(pk.in_(batch)).returning(pk),
+                execution_options={"synchronize_session": False},
+            ).scalars().all()
+            db.session.commit()
+
+            cls.on_bulk_action(ids)
+            affected_count += len(ids)
+
+            if len(ids) < batch_size:
+                return affected_count
 
-        :param ids: List of ids to be deleted
+            last_id = max(ids)
+
+    @classmethod
+    def on_bulk_action(cls, ids):
+        """
+        Called with the ids of each batch affected by `bulk_execute`.
+
+        :param ids: List of affected ids
         :type ids: list
+        :return: None
+        """
+        return None
+
+    @classmethod
+    def bulk_update(cls, criteria, values, batch_size=1000):
+        """
+        Update 1 or more model instances.
+
+        :param criteria: Filter of the items to update
+        :type criteria: SQLAlchemy filter
+        :param values: Columns to set
+        :type values: dict
+        :param batch_size: Max amount of items updated per transaction
+        :type batch_size: int
+        :return: Number of updated instances
+        """
+        return cls.bulk_execute(
+            update(cls).values(**values), criteria, batch_size)
+
+    @classmethod
+    def bulk_delete(cls, criteria, batch_size=1000):
+        """
+        Delete 1 or more model instances. Models using `SoftDeleteMixin` are
+        soft deleted, the same way their `delete` does.
+
+        :param criteria: Filter of the items to delete
+        :type criteria: SQLAlchemy filter
+        :param batch_size: Max amount of items deleted per transaction
+        :type batch_size: int
         :return: Number of deleted instances
         """
-        delete_count = cls.query.filter(cls.id.in_(ids)).delete(
-            synchronize_session=False)
-        db.session.commit()
+        if issubclass(cls, SoftDeleteMixin):
+            return cls.bulk_update(
+                and_(criteria, cls.is_removed.is_(False)),
+                {"is_removed": True},
+                batch_size,
+            )
 
-        return delete_count
+        return cls.bulk_execute(delete(cls), criteria, batch_size)
 
     def save(self):
         """
@@ -133,53 +374,78 @@ class ResourceMixin(object):
         return '<%s %s(%s)>' % (obj_id, self.__class__.__name__, values)
 
 
-class SoftDeleteQueryManager(BaseQuery):
-    """
-    Query manager that decorates a model with soft-delete functionality
+class SoftDeleteMixin(object):
     """
+    Soft delete a model by flagging it as removed instead of deleting its row.
 
-    _with_deleted = False
-
-    def __new__(cls, *args, **kwargs):
-        obj = super(SoftDeleteQueryManager, cls).__new__(cls)
-        obj._with_deleted = kwargs.pop("_with_deleted", False)
-        if len(args) > 0:
-            super(SoftDeleteQueryManager, obj).__init__(*args, **kwargs)
-            return (
-                obj.filter_by(is_removed=False)
-                if not obj._with_deleted
-                else obj
-            )
-        return obj
+    Every ORM SELECT, whether it's from `Model.query`, `select()`,
+    `session.get` or a relationship, skips removed rows unless it's executed
+    with the `with_deleted=True` execution option.
 
-    def __init__(self, *args, **kwargs):
-        pass
+    `session.get` returns an instance that's already in the identity map
+    without any SQL, even if it was removed since it was loaded, so lookups
+    by primary key should go through `get_by_id`.
+    """
+    is_removed = db.Column(db.Boolean(), default=False, nullable=False)
 
-    def with_deleted(self):
-        """
-        Method used to retrieve models that have been soft-deleted
+    @classmethod
+    def get_by_id(cls, id, with_deleted=False):
         """
-        return self.__class__(
-            self._only_full_mapper_zero("get"),
-            session=db.session(),
-            _with_deleted=True,
-        )
+        Find an instance by its primary key, from the identity map if it's
+        already loaded.
 
-    def _get(self, *args, **kwargs):
+        :param id: Primary key
+        :param with_deleted: Also return a removed instance
+        :type with_deleted: bool
+        :return: Model instance or None
         """
-        This calls the original query.get function from the base class
+        options = {"with_deleted": True} if with_deleted else None
+        obj = db.session.get(cls, id, execution_options=options)
+
+        if obj is None or with_deleted or not obj.is_removed:
+            return obj
+
+        return None
+
+    def delete(self):
         """
-        return super(SoftDeleteQueryManager, self).get(*args, **kwargs)
+        Soft delete a model instance.
 
-    def get(self, *args, **kwargs):
+        :return: Model instance
         """
-        Custom implementation of `get`. Query.get doesn't currently allow
-        a filter clause pre-loaded which is why this is necessary.
+        self.is_removed = True
+
+        return self.save()
+
+
+class SoftDeleteQuery(Query):
+    """
+    Query class of soft deleted models, so `Model.query` can opt out of
+    skipping removed rows too.
+    """
+
+    def with_deleted(self):
         """
-        obj = self.with_deleted()._get(*args, **kwargs)
+        Include removed rows.
 
-        return (
-            obj
-            if obj is None or self._with_deleted or not obj.is_removed
-            else None
+        :return: Query
+        """
+        return self.execution_options(with_deleted=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _skip_removed_rows(execute_state):
+    # Column loads refresh an instance that's already loaded, filtering them
+    # would make refreshing a removed instance fail.
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get("with_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeleteMixin,
+                lambda cls: cls.is_removed.is_(False),
+                include_aliases=True,
+            )
         )
@@ -1,9 +1,16 @@
+import threading
+
 import pytest
 from werkzeug.security import generate_password_hash
 
 from config import settings
+from lib.test import wait_for
 from {{ cookiecutter.project_slug }}.app import create_app
 from {{ cookiecutter.project_slug }}.extensions import db as _db
+from {{ cookiecutter.project_slug }}.blueprints.user import passwords
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import (
+    PasswordHasher,
+)
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 
 
@@ -25,6 +32,7 @@ def app():
         "TESTING": True,
         "WTF_CSRF_ENABLED": False,
         "SQLALCHEMY_DATABASE_URI": db_uri,
+        "USER_ACTIVITY_TRACKING": "sync",
     }
 
     _app = create_app(settings_override=params)
@@ -113,7 +121,6 @@ def users(db):
     :return: SQLAlchemy database session
     """
     db.session.query(User).delete()
-    db.session.query(Team).delete()
 
     users = [
         {
@@ -122,7 +129,7 @@ def users(db):
             "password": generate_password_hash("password"),
         },
         {
-            "role": "manager",
+            "role": "member",
             "email": "disabled@{{ cookiecutter.project_slug }}.com",
             "password": generate_password_hash("password"),
             "active": False,
@@ -135,3 +142,45 @@ def users(db):
     db.session.commit()
 
     return db
+
+
+@pytest.fixture(scope="function")
+def blocked_pool(monkeypatch):
+    """
+    Fill a pool of 1 with a verification in flight and another 1 queued,
+    both held until the test is done.
+
+    :param monkeypatch: Pytest fixture
+    :return: PasswordHasher
+    """
+    release = threading.Event()
+    check_password_hash = passwords.check_password_hash
+
+    def slow_check_password_hash(pwhash, password):
+        release.wait(5)
+
+        return check_password_hash(pwhash, password)
+
+    monkeypatch.setattr(passwords, "check_password_hash",
+                        slow_check_password_hash)
+
+    hasher = PasswordHasher()
+    hasher.method = "pbkdf2:sha256:1000"
+    hasher.configure_pool(1, queue_size=1)
+    pwhash = hasher.hash("password")
+
+    threads = [threading.Thread(target=hasher.verify,
+                                args=(pwhash, "password"))
+               for _ in range(2)]
+
+    threads[0].start()
+    wait_for(lambda: hasher.stats()["in_flight"] == 1)
+    threads[1].start()
+    wait_for(lambda: hasher.stats()["queue_depth"] == 1)
+
+    yield hasher
+
+    release.set()
+
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,204 @@
+import json
+import time
+
+from flask import url_for
+from werkzeug.test import EnvironBuilder
+
+from lib.test import ViewTestMixin
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
+
+
+class TestUsers(ViewTestMixin):
+    def get_users(self, **kwargs):
+        token = token_verifier.encode(
+            {"sub": "admin", "role": "admin", "exp": time.time() + 60})
+
+        return self.client.get(
+            url_for("admin.users", **kwargs),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_users_are_paginated(self):
+        """ Every user is returned exactly once across pages """
+        for i in range(5):
+            self.session.add(User(email=f"page{i}@example.com"))
+        self.session.flush()
+
+        emails, cursor = [], None
+
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+
+            response = self.get_users(**params)
+            page = response.get_json()
+
+            assert response.status_code == 200
+            assert len(page["data"]) <= 2
+
+            emails += [user["email"] for user in page["data"]]
+            cursor = page["pagination"]["next_cursor"]
+
+            if cursor is None:
+                break
+
+        assert len(emails) == len(set(emails)) == User.query.count()
+
+    def test_users_filtered_by_role(self):
+        """ Users can be filtered by role """
+        response = self.get_users(role="admin")
+
+        assert all(user["role"] == "admin"
+                   for user in response.get_json()["data"])
+
+    def test_invalid_cursor(self):
+        """ An invalid cursor is rejected """
+        response = self.get_users(cursor="invalid")
+
+        assert response.status_code == 400
+
+
+class TestUsersExport(ViewTestMixin):
+    def export_users(self, **kwargs):
+        token = token_verifier.encode(
+            {"sub": "admin", "role": "admin", "exp": time.time() + 60})
+
+        return self.client.get(
+            url_for("admin.users_export", **kwargs),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_export_ndjson(self):
+        """ Every user is exported as 1 JSON document per line """
+        response = self.export_users()
+        lines = response.get_data(as_text=True).splitlines()
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert len(lines) == User.query.count()
+        assert "password" not in json.loads(lines[0])
+
+    def test_export_csv(self):
+        """ Users are exported as CSV with a header row """
+        response = self.export_users(format="csv")
+        lines = response.get_data(as_text=True).splitlines()
+
+        assert response.status_code == 200
+        assert lines[0] == ",".join(User.EXPORT_FIELDS)
+        assert len(lines) == User.query.count() + 1
+
+
+class TestUsersSearch(ViewTestMixin):
+    def search_users(self, **kwargs):
+        token = token_verifier.encode(
+            {"sub": "admin", "role": "admin", "exp": time.time() + 60})
+
+        return self.client.get(
+            url_for("admin.users", **kwargs),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_search_matches_part_of_an_email(self):
+        """ Users are found by any part of their email """
+        self.session.add(User(email="needle.haystack@example.com"))
+        self.session.flush()
+
+        response = self.search_users(q="haysta")
+        emails = [user["email"] for user in response.get_json()["data"]]
+
+        assert response.status_code == 200
+        assert emails == ["needle.haystack@example.com"]
+
+    def test_search_escapes_wildcards(self):
+        """ LIKE wildcards in a query are matched literally """
+        response = self.search_users(q="%")
+
+        assert response.get_json()["data"] == []
+
+    def test_search_results_are_paginated(self):
+        """ Every match is returned exactly once across ranked pages """
+        for i in range(5):
+            self.session.add(User(email=f"ranked{i}@example.com"))
+        self.session.flush()
+
+        emails, cursor = [], None
+
+        while True:
+            params = {"q": "ranked", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+
+            page = self.search_users(**params).get_json()
+            emails += [user["email"] for user in page["data"]]
+            cursor = page["pagination"]["next_cursor"]
+
+            if cursor is None:
+                break
+
+        assert sorted(emails) == [f"ranked{i}@example.com" for i in range(5)]
+
+    def test_db_time_is_recorded(self):
+        """ Each request's queries and DB time are put in the WSGI environ """
+        token = token_verifier.encode(
+            {"sub": "admin", "role": "admin", "exp": time.time() + 60})
+        environ = EnvironBuilder(
+            url_for("admin.users"),
+            headers={"Authorization": f"Bearer {token}"},
+        ).get_environ()
+
+        # The test client copies the environ, gunicorn logs the one it passed.
+        response = self.client.application(environ, lambda *args: None)
+        b"".join(response)
+        response.close()
+
+        assert environ["db.queries"] > 0
+        assert environ["db.time"] > 0
+
+
+class TestUsersConditionalGet(ViewTestMixin):
+    def get(self, endpoint, etag=None, **kwargs):
+        token = token_verifier.encode(
+            {"sub": "admin", "role": "admin", "exp": time.time() + 60})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        if etag:
+            headers["If-None-Match"] = etag
+
+        return self.client.get(url_for(endpoint, **kwargs), headers=headers)
+
+    def test_unchanged_users_are_not_modified(self):
+        """ A page of users is answered with a 304 when nothing changed """
+        response = self.get("admin.users")
+        etag = response.headers["ETag"]
+
+        assert etag.startswith("W/")
+        assert response.cache_control.private
+
+        response = self.get("admin.users", etag=etag)
+
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_changed_users_are_sent_again(self):
+        """ Updating any user changes the page's ETag """
+        etag = self.get("admin.users").headers["ETag"]
+
+        user = User.query.first()
+        user.role = "admin" if user.role == "member" else "member"
+        self.session.flush()
+
+        response = self.get("admin.users", etag=etag)
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_unchanged_user_is_not_modified(self):
+        """ A user is answered with a 304 when it didn't change """
+        user = User.query.first()
+        etag = self.get("admin.user_detail", id=user.id).headers["ETag"]
+
+        response = self.get("admin.user_detail", etag=etag, id=user.id)
+
+        assert response.status_code == 304
@@ -0,0 +1,56 @@
+import io
+import time
+
+import pytest
+from flask import url_for
+
+from lib.test import ViewTestMixin
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
+
+
+class TestInviteBulk(ViewTestMixin):
+    @pytest.fixture(autouse=True)
+    def registrations(self, monkeypatch):
+        registrations = []
+        monkeypatch.setattr(User, "initialize_registrations",
+                            lambda user_ids: registrations.extend(user_ids))
+        self.registrations = registrations
+
+    def invite(self, **kwargs):
+        token = token_verifier.encode(
+            {"sub": "manager", "role": "manager", "exp": time.time() + 60})
+
+        return self.client.post(
+            url_for("invite.new_users"),
+            headers={"Authorization": f"Bearer {token}"},
+            **kwargs,
+        )
+
+    def test_invite_list(self):
+        """ Every email gets a status and only new users are invited """
+        self.session.add(User(email="bulk.existing@example.com"))
+        self.session.flush()
+
+        emails = ["Bulk.New@example.com", "bulk.new@example.com",
+                  "BULK.EXISTING@example.com", "not an email"]
+        response = self.invite(json={"emails": emails})
+        results = response.get_json()["results"]
+
+        assert response.status_code == 200
+        assert [result["status"] for result in results] == [
+            "invited", "duplicate", "exists", "invalid"]
+        assert len(self.registrations) == 1
+
+        user = User.find_by_email("bulk.new@example.com")
+        assert user.active is False
+        assert self.registrations == [user.id]
+
+    def test_invite_csv_upload(self):
+        """ Emails are read from the first column of an uploaded CSV """
+        upload = io.BytesIO(b"email,name\nbulk.csv@example.com,CSV\n")
+        response = self.invite(data={"file": (upload, "invites.csv")},
+                               content_type="multipart/form-data")
+
+        assert response.get_json()["results"] == [
+            {"email": "bulk.csv@example.com", "status": "invited"}]
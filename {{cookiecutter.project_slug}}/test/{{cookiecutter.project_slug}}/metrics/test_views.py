@@ -0,0 +1,72 @@
+from flask import url_for
+from kombu import Connection, Queue
+
+from lib.test import ViewTestMixin
+from {{ cookiecutter.project_slug }}.blueprints.metrics import recorder
+from {{ cookiecutter.project_slug }}.blueprints.metrics.recorder import (
+    QueueDepthCollector,
+    metrics_recorder,
+    registry,
+)
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import (
+    PasswordHasher,
+)
+
+
+class TestMetrics(ViewTestMixin):
+    def test_metrics(self):
+        """ Metrics are exposed in the Prometheus text format """
+        self.client.get(url_for("up.index"))
+        response = self.client.get(url_for("metrics.index"))
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert 'endpoint="up.index"' in body
+        assert "db_pool_checkouts_total" in body
+        assert 'cache_lookups_total{cache="user",result="hit"}' in body
+
+
+class TestPasswordMetrics:
+    def test_pool_saturation(self, app, blocked_pool, monkeypatch):
+        """ Queued and in flight verifications are exported as gauges """
+        monkeypatch.setattr(recorder, "password_hasher", blocked_pool)
+
+        metrics_recorder.sync(force=True)
+
+        assert registry().get_sample_value(
+            "password_verifications_in_flight") == 1
+        assert registry().get_sample_value(
+            "password_verifications_queued") == 1
+
+    def test_latency(self, app, monkeypatch):
+        """ Every verification is observed into the latency histogram """
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        pwhash = hasher.hash("password")
+        monkeypatch.setattr(recorder, "password_hasher", hasher)
+
+        metrics_recorder.sync(force=True)
+        count = registry().get_sample_value(
+            "password_verification_duration_seconds_count")
+
+        hasher.verify(pwhash, "password")
+        hasher.verify(pwhash, "asdf")
+        metrics_recorder.sync(force=True)
+
+        assert registry().get_sample_value(
+            "password_verification_duration_seconds_count") == count + 2
+
+
+class TestQueueDepthCollector:
+    def test_depths(self):
+        """ Waiting tasks are counted per queue """
+        with Connection("memory://") as broker:
+            producer = broker.Producer()
+
+            for _ in range(3):
+                producer.publish({}, routing_key="bulk",
+                                 declare=[Queue("bulk")])
+
+        collector = QueueDepthCollector("memory://", ["interactive", "bulk"])
+
+        assert collector.depths() == {"interactive": 0, "bulk": 3}
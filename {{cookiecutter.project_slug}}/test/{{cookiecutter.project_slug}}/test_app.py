@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from {{ cookiecutter.project_slug }}.app import dispose_connections
+from {{ cookiecutter.project_slug }}.extensions import db
+
+# Importing the app module is on the startup path of every gunicorn worker,
+# Celery worker and flask command. Raise this deliberately, not to make a
+# slower startup pass.
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", 2500))
+
+ROOT = Path(__file__).resolve().parents[2]
+MODULE = "{{ cookiecutter.project_slug }}.app"
+
+
+def import_app():
+    """
+    Import the app module in a fresh interpreter with -X importtime.
+
+    :return: tuple of (milliseconds, whether Celery loaded its config)
+    """
+    code = f"import {MODULE} as app; print(app.celery_app.configured)"
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+    # Each line is "import time: self [us] | cumulative | module".
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+
+        if len(parts) == 3 and parts[2].strip() == MODULE:
+            return int(parts[1]) / 1000, result.stdout.strip() == "True"
+
+    raise AssertionError(f"{MODULE} missing from:\n{result.stderr}")
+
+
+class TestApp:
+    def test_import_time(self):
+        """ Importing the app stays within its startup budget """
+        import_ms, _ = import_app()
+
+        assert import_ms < IMPORT_TIME_BUDGET_MS, \
+            f"Importing {MODULE} took {import_ms:.0f}ms"
+
+    def test_celery_is_lazy(self):
+        """ Importing the app leaves Celery unconfigured """
+        _, celery_configured = import_app()
+
+        assert celery_configured is False
+
+    def test_dispose_connections(self, app):
+        """ A forked process gets its own connection pool """
+        pool = db.engine.pool
+        dispose_connections(app)
+
+        assert db.engine.pool is not pool
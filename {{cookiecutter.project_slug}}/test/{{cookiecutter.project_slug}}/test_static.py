@@ -0,0 +1,73 @@
+import pytest
+
+DIGESTED = "app-0123456789abcdef0123456789abcdef.css"
+
+
+@pytest.fixture(scope="function")
+def static_folder(app, tmp_path, monkeypatch):
+    """
+    Point the app's static folder at digested files and their compressed
+    copies.
+
+    :param app: Pytest fixture
+    :param tmp_path: Pytest fixture
+    :param monkeypatch: Pytest fixture
+    :return: Path
+    """
+    for name in ("app.css", DIGESTED):
+        (tmp_path / name).write_bytes(b"body{}")
+        (tmp_path / f"{name}.gz").write_bytes(b"gzipped")
+        (tmp_path / f"{name}.br").write_bytes(b"brotli")
+
+    (tmp_path / "robots.txt").write_bytes(b"User-agent: *")
+
+    monkeypatch.setattr(app, "static_folder", str(tmp_path))
+
+    return tmp_path
+
+
+class TestStaticFiles:
+    def test_brotli(self, client, static_folder):
+        """ Brotli is preferred when the client accepts it """
+        response = client.get(f"/{DIGESTED}",
+                              headers={"Accept-Encoding": "gzip, br"})
+
+        assert response.data == b"brotli"
+        assert response.headers["Content-Encoding"] == "br"
+        assert response.headers["Content-Type"].startswith("text/css")
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    def test_gzip(self, client, static_folder):
+        """ Gzip is sent to clients which don't accept brotli """
+        response = client.get(f"/{DIGESTED}",
+                              headers={"Accept-Encoding": "gzip"})
+
+        assert response.data == b"gzipped"
+        assert response.headers["Content-Encoding"] == "gzip"
+
+    def test_identity(self, client, static_folder):
+        """ The uncompressed file is sent without an Accept-Encoding """
+        response = client.get("/robots.txt")
+
+        assert response.data == b"User-agent: *"
+        assert "Content-Encoding" not in response.headers
+
+    def test_digested_files_are_immutable(self, client, static_folder):
+        """ Digested files are cached for a year """
+        response = client.get(f"/{DIGESTED}")
+
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 31536000
+        assert response.cache_control.immutable
+
+    def test_undigested_files_are_revalidated(self, client, static_folder):
+        """ Files without a digest aren't marked immutable """
+        response = client.get("/app.css")
+
+        assert response.data == b"body{}"
+        assert not response.cache_control.immutable
+
+    def test_missing_file(self, client, static_folder):
+        """ Missing files and paths outside the folder are a 404 """
+        assert client.get("/missing.css").status_code == 404
+        assert client.get("/../settings.py").status_code == 404
@@ -0,0 +1,57 @@
+import time
+
+import jwt
+import pytest
+
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import TokenVerifier
+
+
+@pytest.fixture(scope="function")
+def verifier():
+    """
+    Token verifier with its own keyring
+
+    :return: TokenVerifier
+    """
+    verifier = TokenVerifier()
+    verifier.configure("secret", kid="1")
+
+    return verifier
+
+
+class TestTokenVerifier:
+    def test_round_trip(self, verifier):
+        """ Claims survive being encoded and decoded """
+        token = verifier.encode({"sub": "1", "exp": time.time() + 60})
+
+        assert jwt.get_unverified_header(token)["kid"] == "1"
+        assert verifier.decode(token)["sub"] == "1"
+
+    def test_decoded_claims_are_cached(self, verifier):
+        """ Decoding the same token twice is a cache hit """
+        token = verifier.encode({"sub": "1", "exp": time.time() + 60})
+
+        verifier.decode(token)
+        verifier.decode(token)
+
+        assert verifier.stats()["hits"] == 1
+
+    def test_tampered_token_is_rejected(self, verifier):
+        """ A token signed with an unknown secret is rejected """
+        token = jwt.encode({"sub": "1"}, "other", algorithm="HS256")
+
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.decode(token)
+
+    def test_key_rotation(self, verifier):
+        """ Tokens signed with a retired key keep working until removed """
+        token = verifier.encode({"sub": "1", "exp": time.time() + 60})
+
+        verifier.configure("new", kid="2", previous_keys="1:secret")
+        assert verifier.decode(token)["sub"] == "1"
+        assert jwt.get_unverified_header(
+            verifier.encode({"sub": "1"}))["kid"] == "2"
+
+        verifier.configure("new", kid="2")
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.decode(token)
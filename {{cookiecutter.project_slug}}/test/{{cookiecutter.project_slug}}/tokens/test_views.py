@@ -0,0 +1,70 @@
+from flask import url_for
+
+from lib.test import ViewTestMixin
+from {{ cookiecutter.project_slug }}.blueprints.token.models import Token
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+
+
+class TestTokenRefresh(ViewTestMixin):
+    def create_tokens(self):
+        # The seeded admin's email doesn't validate once the project slug
+        # has an underscore in it.
+        if User.find_by_email("tokens@example.com") is None:
+            self.session.add(User(
+                email="tokens@example.com",
+                password=User.encrypt_password("password")))
+            self.session.flush()
+
+        response = self.client.post(url_for("token.token_create"), json={
+            "email": "tokens@example.com",
+            "password": "password",
+        })
+
+        return response.get_json()
+
+    def test_refresh_token_is_stored_hashed(self):
+        """ Only a digest of the refresh token is stored """
+        tokens = self.create_tokens()
+        stored_token = Token.find_by_token(tokens["refresh_token"])
+
+        assert stored_token.token_hash != tokens["refresh_token"]
+        assert len(stored_token.token_hash) == 64
+
+    def test_refresh(self):
+        """ A refresh token is exchanged for a new token pair """
+        tokens = self.create_tokens()
+
+        response = self.client.post(url_for("token.token_refresh"), json={
+            "refresh_token": tokens["refresh_token"],
+        })
+        refreshed = response.get_json()
+
+        assert response.status_code == 200
+        assert refreshed["refresh_token"] != tokens["refresh_token"]
+        assert Token.find_by_token(refreshed["refresh_token"]).family_id == \
+            Token.find_by_token(tokens["refresh_token"]).family_id
+
+    def test_reuse_revokes_family(self):
+        """ Re-using a refresh token revokes every token in its family """
+        tokens = self.create_tokens()
+        url = url_for("token.token_refresh")
+
+        refreshed = self.client.post(url, json={
+            "refresh_token": tokens["refresh_token"],
+        }).get_json()
+        response = self.client.post(url, json={
+            "refresh_token": tokens["refresh_token"],
+        })
+
+        assert response.status_code == 401
+        assert Token.find_by_token(refreshed["refresh_token"]).revoked_on
+
+    def test_access_token_cannot_refresh(self):
+        """ Only refresh tokens can be exchanged """
+        tokens = self.create_tokens()
+
+        response = self.client.post(url_for("token.token_refresh"), json={
+            "refresh_token": tokens["access_token"],
+        })
+
+        assert response.status_code == 401
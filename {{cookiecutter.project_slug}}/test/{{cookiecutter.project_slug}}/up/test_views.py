@@ -1,6 +1,7 @@
 from flask import url_for
 
 from lib.test import ViewTestMixin
+from {{ cookiecutter.project_slug }}.blueprints.up.checks import DependencyCheck
 
 
 class TestUp(ViewTestMixin):
@@ -8,3 +9,38 @@ class TestUp(ViewTestMixin):
         response = self.client.get(url_for("up.index"))
 
         assert response.status_code == 200
+
+    def test_ready(self):
+        """ Ready reports every dependency with its latency """
+        response = self.client.get(url_for("up.ready"))
+        checks = response.json["checks"]
+
+        assert set(checks) == {"postgres", "redis", "broker"}
+        assert checks["postgres"]["ok"] is True
+        assert "latency_ms" in checks["postgres"]
+
+
+class TestDependencyCheck:
+    def test_result_is_cached(self):
+        """ A result is reused until its TTL runs out """
+        calls = []
+        check = DependencyCheck("test", lambda: calls.append(1), ttl=60)
+
+        assert check.result()["ok"] is True
+        assert check.result()["ok"] is True
+        assert len(calls) == 1
+
+        check.ttl = 0
+        check.result()
+
+        assert len(calls) == 2
+
+    def test_failure_is_reported(self):
+        """ A probe that raises is reported as not ok with its error """
+        def probe():
+            raise ConnectionError("refused")
+
+        result = DependencyCheck("test", probe).result()
+
+        assert result["ok"] is False
+        assert result["error"] == "ConnectionError: refused"
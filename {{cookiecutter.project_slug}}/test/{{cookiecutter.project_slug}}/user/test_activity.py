@@ -0,0 +1,83 @@
+import pytest
+
+from {{ cookiecutter.project_slug }}.blueprints.user.activity import (
+    ActivityTracker,
+)
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+
+
+@pytest.fixture(scope="function")
+def tracker(app):
+    """
+    Buffer sign ins until the test flushes them.
+
+    :param app: Pytest fixture
+    :return: ActivityTracker
+    """
+    tracker = ActivityTracker()
+    tracker.app = app
+    tracker.mode = "buffered"
+    tracker.interval = 3600
+
+    return tracker
+
+
+@pytest.fixture(scope="function")
+def activity_users(db):
+    """
+    Create committed users, flushes write them from their own app context
+    so they can't live in a rolled back transaction.
+
+    :param db: Pytest fixture
+    :return: list of users
+    """
+    users = [User(email=f"activity{i}@example.com",
+                  current_sign_in_ip="10.0.0.1")
+             for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    yield users
+
+    db.session.rollback()
+    User.query.filter(User.email.like("activity%@example.com")).delete(
+        synchronize_session=False)
+    db.session.commit()
+
+
+class TestActivityTracker:
+    def test_flush_coalesces_sign_ins(self, db, tracker, activity_users):
+        """ N buffered sign ins add N and keep the 2 latest sign ins """
+        user = activity_users[0]
+
+        for i in range(2, 6):
+            tracker.track(user.id, f"10.0.0.{i}")
+
+        assert tracker.flush() == 1
+
+        db.session.refresh(user)
+        assert user.sign_in_count == 4
+        assert user.current_sign_in_ip == "10.0.0.5"
+        assert user.last_sign_in_ip == "10.0.0.4"
+        assert user.last_sign_in_on < user.current_sign_in_on
+
+    def test_flush_several_users(self, db, tracker, activity_users):
+        """ Users with 1 or more sign ins are written in the same flush """
+        for count, user in enumerate(activity_users, start=1):
+            for i in range(count):
+                tracker.track(user.id, f"10.1.{count}.{i}")
+
+        assert tracker.flush() == 3
+
+        for count, user in enumerate(activity_users, start=1):
+            db.session.refresh(user)
+            assert user.sign_in_count == count
+            assert user.current_sign_in_ip == f"10.1.{count}.{count - 1}"
+
+        single = activity_users[0]
+        assert single.last_sign_in_ip == "10.0.0.1"
+        assert activity_users[2].last_sign_in_ip == "10.1.3.1"
+
+    def test_flush_nothing(self, tracker):
+        """ Flushing an empty buffer writes nothing """
+        assert tracker.flush() == 0
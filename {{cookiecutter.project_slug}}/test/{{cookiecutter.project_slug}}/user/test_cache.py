@@ -0,0 +1,70 @@
+from lib.util_cache import LRUCache
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.user.cache import user_cache
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    def test_hit_and_miss_counts(self):
+        """ Lookups are counted as hits or misses """
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """ The least recently used entry is evicted when full """
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_entries_expire(self):
+        """ Entries expire once their TTL has passed """
+        timer = FakeTimer()
+        cache = LRUCache(maxsize=2, ttl=10, timer=timer)
+        cache.set("a", 1)
+
+        timer.now = 11
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestUserCache:
+    def test_load_caches_user(self, session):
+        """ A second load is answered from the cache """
+        user = User.find_by_email("admin@{{ cookiecutter.project_slug }}.com")
+        user_cache.clear()
+
+        user_cache.load(user.id, User)
+        cached = user_cache.load(user.id, User)
+
+        assert cached.email == user.email
+        assert user_cache.stats()["hits"] == 1
+
+    def test_save_invalidates_user(self, session):
+        """ Saving a user drops it from the cache """
+        user = User.find_by_email("admin@{{ cookiecutter.project_slug }}.com")
+        user_cache.clear()
+        user_cache.load(user.id, User)
+
+        user.name = "Cache Test"
+        user.save()
+
+        assert user_cache.local.get(str(user.id)) is None
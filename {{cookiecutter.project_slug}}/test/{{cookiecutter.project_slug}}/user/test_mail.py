@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+from flask_mail import Mail, Message
+
+from lib.util_mail import MailDelivery
+
+
+class RecordingHandler(object):
+    def __init__(self):
+        self.messages = []
+        self.sessions = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+
+        if not any(s is session for s in self.sessions):
+            self.sessions.append(session)
+
+        return "250 OK"
+
+
+@pytest.fixture(scope="function")
+def smtp_server(app, monkeypatch):
+    """
+    Run a local SMTP server and point Flask-Mail at it.
+
+    :param app: Pytest fixture
+    :param monkeypatch: Pytest fixture
+    :return: Controller whose handler records what it received
+    """
+    controller = Controller(RecordingHandler(), hostname="127.0.0.1")
+    controller.start()
+
+    config = {
+        "MAIL_SERVER": controller.hostname,
+        "MAIL_PORT": controller.port,
+        "MAIL_USE_TLS": False,
+        "MAIL_SUPPRESS_SEND": False,
+    }
+    monkeypatch.setitem(app.extensions, "mail", Mail().init_mail(config))
+
+    yield controller
+
+    controller.stop()
+
+
+def message(number):
+    return Message(f"Message {number}", sender="noreply@example.com",
+                   recipients=[f"user{number}@example.com"])
+
+
+class TestMailDelivery:
+    def test_messages_share_a_connection(self, smtp_server):
+        """ Messages go out over 1 connection """
+        delivery = MailDelivery()
+
+        delivery.send_many([message(1), message(2)])
+        delivery.send(message(3))
+        delivery.close()
+
+        assert len(smtp_server.handler.messages) == 3
+        assert len(smtp_server.handler.sessions) == 1
+        assert delivery.connects == 1
+
+    def test_reconnects_after_a_dropped_connection(self, smtp_server):
+        """ A message is sent again over a new connection """
+        delivery = MailDelivery()
+        delivery.send(message(1))
+
+        # smtplib raises SMTPServerDisconnected once the socket is gone.
+        delivery._connection.host.close()
+
+        delivery.send(message(2))
+        delivery.close()
+
+        assert len(smtp_server.handler.messages) == 2
+        assert delivery.connects == 2
+
+    def test_rate_limit(self, smtp_server):
+        """ Sends are spaced out to the rate limit """
+        delivery = MailDelivery()
+        delivery.rate_limit = 20
+
+        started_at = time.monotonic()
+        delivery.send_many([message(1), message(2), message(3)])
+        delivery.close()
+
+        assert time.monotonic() - started_at >= 0.1
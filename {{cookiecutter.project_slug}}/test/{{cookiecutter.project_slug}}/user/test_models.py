@@ -1,3 +1,5 @@
+from sqlalchemy import event, select, text
+
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 
 
@@ -10,3 +12,97 @@ class TestUser:
         """ Token de-serializes a JWS correctly """
         user = User.deserialize_token(token)
         assert user.email == "admin@{{ cookiecutter.project_slug }}.com"
+
+
+class TestUserSoftDelete:
+    def test_removed_user_is_hidden(self, session):
+        """ A soft deleted user is skipped by every kind of lookup """
+        user = User(email="soft.delete@example.com")
+        session.add(user)
+        session.flush()
+        user.is_removed = True
+        session.flush()
+
+        assert User.find_by_id(user.id) is None
+        assert User.find_by_email(user.email) is None
+        assert session.scalars(
+            select(User).where(User.email == user.email)).first() is None
+
+    def test_removed_user_can_be_included(self, session):
+        """ Removed users are returned when asked for explicitly """
+        user = User(email="soft.deleted@example.com", is_removed=True)
+        session.add(user)
+        session.flush()
+        statement = select(User).where(User.email == user.email)
+
+        assert User.get_by_id(user.id, with_deleted=True) is user
+        assert User.query.with_deleted().filter(
+            User.email == user.email).first() is user
+        assert session.scalars(statement.execution_options(
+            with_deleted=True)).first() is user
+
+
+class TestUserEmailLookup:
+    def test_lookup_ignores_case(self, session):
+        """ Emails are found regardless of their case """
+        user = User.find_by_email(" Admin@{{ cookiecutter.project_slug }}.COM")
+
+        assert user.email == "admin@{{ cookiecutter.project_slug }}.com"
+
+    def test_removed_email_can_be_reused(self, session):
+        """ Only users that aren't soft deleted need a unique email """
+        session.add(User(email="Reused@example.com", is_removed=True))
+        session.add(User(email="reused@example.com"))
+        session.flush()
+
+        assert User.find_by_email("REUSED@example.com").is_removed is False
+
+    def test_lookup_uses_the_email_index(self, session):
+        """ The lookup's query plan goes through uq_users_email_lower """
+        connection = session.connection()
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, many):
+            statements.append((statement, parameters))
+
+        # The test table is tiny, so the planner would rather scan it.
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+
+        event.listen(connection, "before_cursor_execute", capture)
+        try:
+            User.find_by_email("admin@{{ cookiecutter.project_slug }}.com")
+        finally:
+            event.remove(connection, "before_cursor_execute", capture)
+
+        statement, parameters = statements[-1]
+        plan = connection.exec_driver_sql(
+            "EXPLAIN " + statement, parameters).scalars().all()
+
+        assert "uq_users_email_lower" in "\n".join(plan)
+
+
+class TestUserBulkActions:
+    def test_bulk_delete_search_results(self, session):
+        """ Bulk deleting search results soft deletes all but omitted ids """
+        users = [User(email=f"bulkdel{i}@example.com") for i in range(5)]
+        session.add_all(users)
+        session.flush()
+
+        criteria = User.get_bulk_action_filter(
+            "all_search_results", [], omit_ids=[users[0].id], query="bulkdel")
+        delete_count = User.bulk_delete(criteria, batch_size=2)
+
+        assert delete_count == 4
+        assert User.query.filter(User.search("bulkdel")).count() == 1
+        assert User.query.with_deleted().filter(
+            User.search("bulkdel")).count() == 5
+
+    def test_bulk_delete_selected_items(self, session):
+        """ Users that are already soft deleted aren't counted again """
+        user = User(email="bulk.selected@example.com", is_removed=True)
+        session.add(user)
+        session.flush()
+
+        criteria = User.get_bulk_action_filter("all_selected_items", [user.id])
+
+        assert User.bulk_delete(criteria) == 0
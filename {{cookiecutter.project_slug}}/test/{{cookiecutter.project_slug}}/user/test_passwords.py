@@ -0,0 +1,81 @@
+import pytest
+
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import (
+    PasswordHasher,
+    PasswordHasherBusy,
+)
+
+
+class TestPasswordHasher:
+    def test_hash_and_verify(self):
+        """ A hashed password verifies only with the right password """
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        pwhash = hasher.hash("password")
+
+        assert pwhash.startswith("pbkdf2:sha256:1000$")
+        assert hasher.verify(pwhash, "password")
+        assert not hasher.verify(pwhash, "asdf")
+
+    def test_unusable_password(self):
+        """ Unusable passwords never verify and never need a rehash """
+        hasher = PasswordHasher()
+        pwhash = hasher.unusable()
+
+        assert not hasher.is_usable(pwhash)
+        assert not hasher.verify(pwhash, pwhash)
+        assert not hasher.needs_rehash(pwhash)
+
+    def test_needs_rehash(self):
+        """ Hashes made with another cost need a rehash """
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        pwhash = hasher.hash("password")
+
+        assert not hasher.needs_rehash(pwhash)
+
+        hasher.method = "pbkdf2:sha256:2000"
+        assert hasher.needs_rehash(pwhash)
+
+    def test_normalize(self):
+        """ Methods are normalized with Werkzeug's default costs """
+        assert PasswordHasher.normalize("pbkdf2") == "pbkdf2:sha256:600000"
+        assert PasswordHasher.normalize("scrypt:16384") == "scrypt:16384:8:1"
+
+    def test_verify_in_pool(self):
+        """ Passwords verify the same way through the pool """
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        hasher.configure_pool(2, queue_size=1)
+        pwhash = hasher.hash("password")
+
+        assert hasher.verify(pwhash, "password")
+        assert not hasher.verify(pwhash, "asdf")
+        assert hasher.stats()["verified"] == 2
+
+    def test_full_pool_fails_fast(self, blocked_pool):
+        """ Verifying with a full pool and queue raises right away """
+        pwhash = blocked_pool.hash("password")
+
+        with pytest.raises(PasswordHasherBusy):
+            blocked_pool.verify(pwhash, "password")
+
+        stats = blocked_pool.stats()
+
+        assert stats["in_flight"] == 1
+        assert stats["queue_depth"] == 1
+        assert stats["rejected"] == 1
+
+    def test_drain_latencies(self):
+        """ Every verification's latency is drained once """
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        pwhash = hasher.hash("password")
+
+        hasher.verify(pwhash, "password")
+        hasher.verify(pwhash, "asdf")
+        latencies = hasher.drain_latencies()
+
+        assert len(latencies) == 2
+        assert all(latency > 0 for latency in latencies)
+        assert hasher.drain_latencies() == []
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy_utils import create_database, database_exists
+
+from {{ cookiecutter.project_slug }}.app import create_app
+from {{ cookiecutter.project_slug }}.extensions import db as _db
+from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+
+REPLICA_EMAIL = "replica.only@example.com"
+
+
+@pytest.fixture(scope="module")
+def replica_app(app):
+    """
+    Setup an app whose replica is a second test database. Nothing replicates
+    into it, so a user that only exists there tells where a read went.
+
+    :param app: Pytest fixture
+    :return: Flask app
+    """
+    db_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    replica_uri = db_uri.replace("_test", "_test_replica")
+
+    if not database_exists(replica_uri):
+        create_database(replica_uri)
+
+    params = {
+        "DEBUG": False,
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": db_uri,
+        "SQLALCHEMY_BINDS": {"replica_0": replica_uri},
+        "USER_ACTIVITY_TRACKING": "sync",
+    }
+    _app = create_app(settings_override=params)
+
+    with _app.app_context():
+        replica = _db.engines["replica_0"]
+        _db.metadata.drop_all(bind=replica)
+        _db.metadata.create_all(bind=replica)
+
+        with replica.begin() as connection:
+            connection.execute(
+                insert(User.__table__).values(email=REPLICA_EMAIL))
+
+    yield _app
+
+    with _app.app_context():
+        _db.metadata.drop_all(bind=_db.engines["replica_0"])
+
+
+class TestReplicas:
+    def test_reads_go_to_the_replica(self, replica_app):
+        """ Read only queries are sent to the replica """
+        with replica_app.app_context():
+            assert User.find_by_email(REPLICA_EMAIL) is not None
+
+    def test_reads_stick_to_the_primary_after_a_write(self, replica_app):
+        """ Reads after a write in the same context go to the primary """
+        with replica_app.app_context():
+            user = User(email="replica.write@example.com").save()
+
+            assert User.find_by_email(user.email) is not None
+            assert User.find_by_email(REPLICA_EMAIL) is None
+
+            _db.session.delete(user)
+            _db.session.commit()
+
+    def test_unhealthy_replica_is_skipped(self, replica_app):
+        """ Reads fall back to the primary while every replica is down """
+        replicas = replica_app.extensions["replica_router"]
+        replicas.mark_down("replica_0")
+
+        try:
+            with replica_app.app_context():
+                assert User.find_by_email(REPLICA_EMAIL) is None
+        finally:
+            replicas.down_until.clear()
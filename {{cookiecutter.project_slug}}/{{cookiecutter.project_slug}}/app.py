@@ -1,16 +1,29 @@
-from flask import Flask
+from flask import Flask, current_app, g, has_app_context
 from werkzeug.debug import DebuggedApplication
 from werkzeug.middleware.proxy_fix import ProxyFix
 from celery import Celery
 
+from lib.util_conditional import conditional_get
+from lib.util_instrumentation import query_instrumentation
+from lib.util_mail import mail_delivery
+from lib.util_replica import replica_router
+from lib.util_static import static_files
+
 from {{ cookiecutter.project_slug }}.blueprints.page.views import page
 from {{ cookiecutter.project_slug }}.blueprints.up.views import up
+from {{ cookiecutter.project_slug }}.blueprints.up.checks import readiness_checks
+from {{ cookiecutter.project_slug }}.blueprints.metrics import metrics
+from {{ cookiecutter.project_slug }}.blueprints.metrics.recorder import metrics_recorder
 from {{ cookiecutter.project_slug }}.blueprints.user import user
 from {{ cookiecutter.project_slug }}.blueprints.invite import invite
 from {{ cookiecutter.project_slug }}.blueprints.billing import billing
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.user.cache import user_cache
+from {{ cookiecutter.project_slug }}.blueprints.user.activity import activity_tracker
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import password_hasher
 from {{ cookiecutter.project_slug }}.blueprints.admin import admin
 from {{ cookiecutter.project_slug }}.blueprints.token import token
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
 from {{ cookiecutter.project_slug }}.blueprints.cmd import cmd
 from {{ cookiecutter.project_slug }}.extensions import db
 from {{ cookiecutter.project_slug }}.extensions import apifairy
@@ -25,21 +38,44 @@ def create_celery_app(app=None):
     """
     Create a new Celery app and tie together the Celery config to the app's
     config. Wrap all tasks in the context of the application.
+
+    Without an app, the Flask app is only looked up once Celery needs its
+    config or runs a task. That's the app of the current app context, such as
+    a request publishing a task, or a new app in a Celery worker. Importing
+    this module therefore doesn't create an app.
     :param app: Flask app
     :return: Celery app
     """
-    app = app or create_app()
+    def flask_app():
+        nonlocal app
+
+        if app is None:
+            if has_app_context():
+                app = current_app._get_current_object()
+            else:
+                app = create_app()
 
-    celery = Celery(app.import_name)
-    celery.conf.update(app.config.get("CELERY_CONFIG", {}))
+        return app
+
+    celery = Celery(__name__)
+    celery.add_defaults(lambda: flask_app().config.get("CELERY_CONFIG", {}))
     TaskBase = celery.Task
 
     class ContextTask(TaskBase):
         abstract = True
 
         def __call__(self, *args, **kwargs):
+            app = flask_app()
+
             with app.app_context():
-                return TaskBase.__call__(self, *args, **kwargs)
+                g.task_name = self.name
+
+                try:
+                    return TaskBase.__call__(self, *args, **kwargs)
+                finally:
+                    queries, duration = query_instrumentation.totals()
+                    app.logger.info("Task %s ran %d queries in %.1fms",
+                                    self.name, queries, duration * 1000)
 
     celery.Task = ContextTask
 
@@ -62,6 +98,7 @@ def create_app(settings_override=None):
 
     middleware(app)
     app.register_blueprint(up)
+    app.register_blueprint(metrics)
     app.register_blueprint(page)
     app.register_blueprint(user)
     app.register_blueprint(token)
@@ -83,11 +120,18 @@ def extensions(app):
     :return: None
     """
     db.init_app(app)
+    replica_router.init_app(app)
+    query_instrumentation.init_app(app)
+    metrics_recorder.init_app(app)
+    readiness_checks.init_app(app)
     flask_static_digest.init_app(app)
+    static_files.init_app(app)
     marshmallow.init_app(app)
     apifairy.init_app(app)
+    conditional_get.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    mail_delivery.init_app(app)
     toolbar.init_app(app)
 
     return None
@@ -112,13 +156,19 @@ def middleware(app):
 
 def authentication(app, user_model):
     """
-    Initialize Flask-Login extension (this mutates the app passed in)
+    Initialize Flask-Login extension, password hashing, sign in activity
+    tracking and the JWT verifier used by the API (this mutates the app
+    passed in)
 
     :param app: Flask application instance
     :param user_model: Model that contains the authentication info
     :return: None
     """
     login_manager.login_view = "user.login"
+    user_cache.init_app(app)
+    password_hasher.init_app(app)
+    activity_tracker.init_app(app)
+    token_verifier.init_app(app)
 
     @login_manager.user_loader
     def load_user(uuid):
@@ -128,10 +178,35 @@ def authentication(app, user_model):
         `current_user`, `is_authenticated`, `is_anonymous`, etc in
         the application.
 
+        Lookups go through the user identity cache first so most requests
+        don't need to hit the database.
+
         :param uuid: uuid
         :return: User instance
         """
-        return user_model.query.get(uuid)
+        return user_cache.load(uuid, user_model)
+
+
+def dispose_connections(app):
+    """
+    Forget the database and Redis connections a forked process inherited,
+    such as a gunicorn worker forked from a master which preloaded the app.
+    Their sockets are shared with the parent, so the child opens its own
+    instead. They're not closed, the parent can keep using them.
+
+    :param app: Flask application instance
+    :return: None
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    for client in (readiness_checks.redis,
+                   user_cache.shared and user_cache.shared.client):
+        if client is not None:
+            client.connection_pool.reset()
+
+    return None
 
 
 celery_app = create_celery_app()
@@ -1,15 +1,56 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, abort, current_app, render_template
+from flask import request
+from flask import stream_with_context
 
-from apifairy import response
+from apifairy import arguments, response
 from flask_login import login_required
 
+from lib.util_conditional import conditional_get
+from lib.util_export import render_export, EXPORT_FORMATS
+
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 from {{ cookiecutter.project_slug }}.blueprints.token.utils import token_auth
 from {{ cookiecutter.project_slug }}.blueprints.user.decorators import role_required
-from {{ cookiecutter.project_slug }}.blueprints.user.schemas import user_schema, users_schema
+from {{ cookiecutter.project_slug }}.blueprints.user.schemas import (
+    user_schema,
+    user_list_args_schema,
+    user_page_schema,
+    user_export_args_schema,
+)
 
 admin = Blueprint("admin", __name__, template_folder="templates")
 
+
+def paginate_users(query, args, limit):
+    """
+    Paginate users, ranked from the best match down when searching.
+
+    :param query: Query of users to paginate
+    :type query: SQLAlchemy query
+    :param args: Parsed pagination arguments, see `UserListArgsSchema`
+    :type args: dict
+    :param limit: Max amount of users on a page
+    :type limit: int
+    :raises: ValueError if the cursor is invalid
+    :return: tuple of (users, next cursor or None)
+    """
+    if args.get("q"):
+        return User.paginate_ranked(
+            query.filter(User.search(args["q"])),
+            User.search_rank(args["q"]),
+            cursor=args.get("cursor"),
+            limit=limit,
+        )
+
+    return User.paginate_keyset(
+        query,
+        cursor=args.get("cursor"),
+        limit=limit,
+        sort=args.get("sort", "created_on"),
+        direction=args.get("direction", "desc"),
+    )
+
+
 # -----------------------------------------------------------------------------
 # REST ROUTES
 # -----------------------------------------------------------------------------
@@ -17,12 +58,49 @@ admin = Blueprint("admin", __name__, template_folder="templates")
 
 @admin.route("/api/users")
 @token_auth.login_required(role=["admin"])
-@response(users_schema)
-def users():
-    """Retrieve all users"""
-    users = User.query.all()
+@arguments(user_list_args_schema)
+@response(user_page_schema)
+def users(args):
+    """Retrieve a page of users"""
+    limit = min(
+        args.get("limit", current_app.config["API_PAGE_LIMIT"]),
+        current_app.config["API_PAGE_MAX_LIMIT"],
+    )
+
+    query = User.query
+
+    if "role" in args:
+        query = query.filter(User.role == args["role"])
+
+    if "active" in args:
+        query = query.filter(User.active.is_(args["active"]))
+
+    # Any page, sort or search of these users changes with their watermark.
+    conditional_get.check(*User.watermark(query))
+
+    users, next_cursor = paginate_users(query, args, limit)
+
+    return {
+        "data": users,
+        "pagination": {"limit": limit, "next_cursor": next_cursor},
+    }
+
+
+@admin.route("/api/users/export")
+@token_auth.login_required(role=["admin"])
+@arguments(user_export_args_schema)
+def users_export(args):
+    """Stream every user as NDJSON or CSV"""
+    fmt = args["format"]
+    rows = render_export(User.export(), User.EXPORT_FIELDS, fmt)
 
-    return users
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename=users.{fmt}",
+        },
+    )
 
 
 @admin.route("/api/users/<id>")
@@ -32,6 +110,9 @@ def user_detail(id):
     """Retrieve user detail"""
     user = User.find_by_id(id)
 
+    if user is not None:
+        conditional_get.check(user.id, user.updated_on)
+
     return user
 
 
@@ -44,5 +125,16 @@ def user_detail(id):
 @login_required
 @role_required("admin")
 def index():
-    context = {"users": User.query.all()}
+    args = {
+        "q": request.args.get("q", "").strip(),
+        "cursor": request.args.get("cursor"),
+    }
+
+    try:
+        users, next_cursor = paginate_users(
+            User.query, args, current_app.config["API_PAGE_LIMIT"])
+    except ValueError:
+        abort(400)
+
+    context = {"users": users, "q": args["q"], "next_cursor": next_cursor}
     return render_template("admin/index.html", context=context)
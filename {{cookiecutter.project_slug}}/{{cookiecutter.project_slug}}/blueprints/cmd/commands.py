@@ -1,9 +1,13 @@
+import multiprocessing
+import os
+
 import click
 from flask import Blueprint
-from werkzeug.security import generate_password_hash
 
 from lib.util_cli import log_status
+from lib.util_export import render_export, EXPORT_FORMATS
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import password_hasher
 
 
 cmd = Blueprint("cmd", __name__)
@@ -19,9 +23,41 @@ def create(email, password):
     params = {
         "role": "member",
         "email": email,
-        "password": generate_password_hash(password),
+        "password": User.encrypt_password(password),
     }
 
     User(**params).save()
 
     log_status(1, "user")
+
+
+@cmd.cli.command("export-users")
+@click.option("--format", "fmt", default="ndjson",
+              type=click.Choice(list(EXPORT_FORMATS)))
+@click.option("--batch-size", default=1000,
+              help="Rows fetched from the database at a time")
+@click.argument("output", type=click.File("w"), default="-")
+def export_users(fmt, batch_size, output):
+    """ Stream every user to a file, or stdout by default """
+    for chunk in render_export(
+            User.export(batch_size=batch_size), User.EXPORT_FIELDS, fmt):
+        output.write(chunk)
+
+
+@cmd.cli.command("hash-benchmark")
+@click.option("--method", default=None,
+              help="Hash method to try, defaults to PASSWORD_HASH_METHOD")
+@click.option("--seconds", default=3.0, help="How long to hash for")
+@click.option("--workers",
+              default=int(os.getenv("WEB_CONCURRENCY",
+                                    multiprocessing.cpu_count() * 2)),
+              help="Gunicorn workers to size login throughput against")
+def hash_benchmark(method, seconds, workers):
+    """ Measure password hashes per second per worker """
+    method = password_hasher.normalize(method or password_hasher.method)
+    click.echo(f"Hashing with {method} for {seconds}s...")
+
+    rate = password_hasher.benchmark(seconds=seconds, method=method)
+
+    click.echo(f"{rate:.1f} hashes/s per worker, {1000 / rate:.1f}ms each")
+    click.echo(f"~{rate * workers:.1f} logins/s across {workers} workers")
@@ -1,3 +1,4 @@
+from apifairy import FileField
 from marshmallow import validate
 
 from {{ cookiecutter.project_slug }}.extensions import marshmallow as ma
@@ -8,3 +9,30 @@ class InviteCreate(ma.Schema):
 
 
 invite_create_schema = InviteCreate()
+
+
+class InviteBulkCreate(ma.Schema):
+    emails = ma.List(ma.String(), load_default=[])
+
+
+class InviteBulkUpload(ma.Schema):
+    file = FileField(metadata={
+        "description": "CSV file with an email in its first column"})
+
+
+class InviteResult(ma.Schema):
+    email = ma.String()
+    status = ma.String(metadata={
+        "description": "invited, exists, duplicate or invalid"})
+
+
+class InviteBulkResult(ma.Schema):
+    success = ma.Boolean()
+    message = ma.String()
+    invited = ma.Integer()
+    results = ma.List(ma.Nested(InviteResult))
+
+
+invite_bulk_create_schema = InviteBulkCreate()
+invite_bulk_upload_schema = InviteBulkUpload()
+invite_bulk_result_schema = InviteBulkResult()
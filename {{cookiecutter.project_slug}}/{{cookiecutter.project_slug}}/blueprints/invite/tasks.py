@@ -1,25 +1,42 @@
-from flask_mail import Message
 from flask import render_template
+from sqlalchemy import select
 
-from {{ cookiecutter.project_slug }}.extensions import mail
+from lib.util_mail import mail_delivery, text_email
 from {{ cookiecutter.project_slug }}.app import celery_app as celery
+from {{ cookiecutter.project_slug }}.extensions import db
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 
 
-def send_email(subject, sender, recipient, text_body):
-    msg = Message(subject, sender=sender, recipients=[recipient])
-    msg.body = text_body
-    mail.send(msg)
-
-
-@celery.task(name="deliver_registration_email")
-def deliver_registration_email(user_id, token):
-    user = User.find_by_id(user_id)
+def registration_email(user, token):
     ctx = {"user": user, "token": token}
 
-    send_email(
+    return text_email(
         "Headshots.ai User Registration",
         "admin@mail.headshots.ai",
         user.email,
         render_template("invite/email/user_registration.txt", ctx=ctx)
     )
+
+
+@celery.task(name="deliver_registration_email", ignore_result=True)
+def deliver_registration_email(user_id, token):
+    user = User.find_by_id(user_id)
+
+    mail_delivery.send(registration_email(user, token))
+
+
+@celery.task(name="deliver_registration_emails", ignore_result=True)
+def deliver_registration_emails(user_ids):
+    """
+    Send the registration emails of a batch of invited users, loaded with 1
+    query and sent over 1 SMTP connection.
+
+    :param user_ids: Ids of the invited users
+    :type user_ids: list
+    :return: Number of emails sent
+    """
+    users = db.session.scalars(select(User).where(User.id.in_(user_ids)))
+    messages = [registration_email(user, user.serialize_token())
+                for user in users]
+
+    return mail_delivery.send_many(messages)
@@ -1,11 +1,20 @@
-from flask import Blueprint
+import csv
+import io
 
-from apifairy import response, body
+from flask import Blueprint, current_app
+
+from apifairy import arguments, response, body
+from marshmallow import ValidationError, validate
 
 from lib.util_schema import api_message_schema
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 from {{ cookiecutter.project_slug }}.blueprints.token.utils import token_auth
-from {{ cookiecutter.project_slug }}.blueprints.invite.schemas import invite_create_schema
+from {{ cookiecutter.project_slug }}.blueprints.invite.schemas import (
+    invite_create_schema,
+    invite_bulk_create_schema,
+    invite_bulk_upload_schema,
+    invite_bulk_result_schema,
+)
 
 invite = Blueprint("invite", __name__, template_folder="templates")
 
@@ -37,3 +46,89 @@ def new_user(args):
         "success": True,
         "message": "Invite sent"
     }
+
+
+@invite.route("/api/invites/bulk", methods=["POST"])
+@token_auth.login_required(role=["manager"])
+@body(invite_bulk_create_schema)
+@arguments(invite_bulk_upload_schema, location="files")
+@response(invite_bulk_result_schema)
+def new_users(args, files):
+    """Invite many team members from a list of emails or a CSV upload"""
+    emails = list(args["emails"])
+
+    if files.get("file"):
+        emails.extend(read_csv_emails(files["file"]))
+
+    max_emails = current_app.config["INVITE_BULK_MAX_EMAILS"]
+
+    if len(emails) > max_emails:
+        return {
+            "success": False,
+            "message": f"At most {max_emails} emails can be invited at once",
+        }, 400
+
+    is_email = validate.Email()
+    checked = []
+    unique = []
+    seen = set()
+
+    for email in emails:
+        normalized = User.normalize_email(email)
+        status = None
+
+        try:
+            is_email(normalized)
+        except ValidationError:
+            status = "invalid"
+        else:
+            if normalized in seen:
+                status = "duplicate"
+            else:
+                seen.add(normalized)
+                unique.append(normalized)
+
+        checked.append((email, normalized, status))
+
+    invited = User.invite_many(unique)
+    User.initialize_registrations(list(invited.values()))
+
+    results = [
+        {
+            "email": email,
+            "status": status or (
+                "invited" if normalized in invited else "exists"),
+        }
+        for email, normalized, status in checked
+    ]
+
+    return {
+        "success": True,
+        "message": f"{len(invited)} invites sent",
+        "invited": len(invited),
+        "results": results,
+    }
+
+
+def read_csv_emails(file):
+    """
+    Read the email in the first column of every row of a CSV upload, skipping
+    blank rows and an "email" header.
+
+    :param file: Uploaded file
+    :type file: werkzeug.datastructures.FileStorage
+    :return: list
+    """
+    emails = []
+    rows = csv.reader(io.TextIOWrapper(file.stream, encoding="utf-8-sig"))
+
+    for row in rows:
+        if not row or not row[0].strip():
+            continue
+
+        if not emails and row[0].strip().lower() == "email":
+            continue
+
+        emails.append(row[0])
+
+    return emails
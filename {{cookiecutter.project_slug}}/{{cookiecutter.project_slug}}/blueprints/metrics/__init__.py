@@ -0,0 +1 @@
+from {{ cookiecutter.project_slug }}.blueprints.metrics.views import metrics  # noqa: F401
@@ -0,0 +1,362 @@
+import os
+import shutil
+import threading
+import time
+
+from celery.signals import (
+    before_task_publish,
+    celeryd_init,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_ready,
+)
+from flask import g, request
+from kombu import Connection
+from kombu.exceptions import ChannelError
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from lib.util_pool import pool_stats
+from {{ cookiecutter.project_slug }}.extensions import db
+from {{ cookiecutter.project_slug }}.blueprints.user.cache import user_cache
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import password_hasher
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
+
+# Metrics are written to files in this directory as soon as they're defined.
+if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["endpoint", "method", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests being handled",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool")
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting")
+DB_POOL_WAIT = Counter(
+    "db_pool_checkout_wait_seconds_total", "Time spent waiting on checkouts")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections in use", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections over the pool size",
+    multiprocess_mode="livesum")
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups", ["cache", "result"])
+
+PASSWORD_VERIFICATIONS = Counter(
+    "password_verifications_total", "Passwords verified")
+PASSWORD_REJECTIONS = Counter(
+    "password_verifications_rejected_total",
+    "Password verifications rejected because the pool was full")
+PASSWORD_QUEUE_DEPTH = Gauge(
+    "password_verifications_queued", "Verifications waiting for the pool",
+    multiprocess_mode="livesum")
+PASSWORD_IN_FLIGHT = Gauge(
+    "password_verifications_in_flight", "Verifications being computed",
+    multiprocess_mode="livesum")
+PASSWORD_LATENCY = Histogram(
+    "password_verification_duration_seconds",
+    "Time from requesting a verification to its result, queueing included",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+CELERY_TASKS_ENQUEUED = Counter(
+    "celery_tasks_enqueued_total", "Tasks sent to the broker", ["task"])
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Time spent running a task",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+
+def registry():
+    """
+    Return the registry to scrape. With PROMETHEUS_MULTIPROC_DIR set every
+    process writes its metrics to memory mapped files in that directory, and
+    scraping any 1 of them adds all of them up.
+
+    :return: CollectorRegistry
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        from prometheus_client import REGISTRY
+
+        return REGISTRY
+
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+
+    return collector_registry
+
+
+def reset_multiprocess_dir():
+    """
+    Empty PROMETHEUS_MULTIPROC_DIR, call it once before forking any workers
+    so metrics of processes from a previous run don't linger.
+
+    :return: None
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+    return None
+
+
+def mark_process_dead(pid):
+    """
+    Drop the live gauges of a worker which exited.
+
+    :param pid: Process id
+    :type pid: int
+    :return: None
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+    return None
+
+
+class QueueDepthCollector(object):
+    """
+    Count the messages waiting in each Celery queue when metrics are scraped.
+
+    Queue depth lives in the broker rather than in any process, so it's read
+    by the web app's scrape instead of being recorded by the workers.
+    """
+
+    def __init__(self, broker_url=None, queues=(), transport_options=None,
+                 timeout=2):
+        self.broker_url = broker_url
+        self.queues = queues
+        self.transport_options = transport_options or {}
+        self.timeout = timeout
+
+    def depths(self):
+        """
+        Read how many messages wait in each queue, across all priorities.
+
+        :return: dict of queue name to depth
+        """
+        depths = {}
+
+        with Connection(self.broker_url, connect_timeout=self.timeout,
+                        transport_options=self.transport_options) as broker:
+            broker.ensure_connection(max_retries=0)
+            channel = broker.default_channel
+
+            for queue in self.queues:
+                try:
+                    depths[queue] = channel.queue_declare(
+                        queue=queue, passive=True).message_count
+                except ChannelError:
+                    # Redis only has a queue while messages are waiting.
+                    depths[queue] = 0
+
+        return depths
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "celery_queue_depth", "Tasks waiting in a Celery queue",
+            labels=["queue"])
+
+        if self.broker_url and self.queues:
+            for queue, depth in self.depths().items():
+                family.add_metric([queue], depth)
+
+        yield family
+
+
+class MetricsRecorder(object):
+    """
+    Record request metrics around every request.
+
+    The DB pool, caches and password hasher count their own stats in each
+    process. Those are copied into metrics at most every
+    METRICS_SYNC_INTERVAL seconds so a request only pays for the handful of
+    metric updates it makes itself.
+    """
+
+    def __init__(self, app=None):
+        self.sync_interval = 1.0
+
+        self._synced_at = 0.0
+        self._seen = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+        self.queue_depth = QueueDepthCollector()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the request hooks and find the Celery queues to watch.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.sync_interval = app.config.get("METRICS_SYNC_INTERVAL", 1.0)
+
+        celery_config = app.config.get("CELERY_CONFIG", {})
+        self.queue_depth = QueueDepthCollector(
+            celery_config.get("broker_url"),
+            [queue.name for queue in celery_config.get("task_queues", [])],
+            celery_config.get("broker_transport_options"),
+        )
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        app.extensions["metrics_recorder"] = self
+
+        return None
+
+    def sync(self, force=False):
+        """
+        Copy this process' pool, cache and password stats into metrics.
+
+        :param force: Sync even if the last sync was recent
+        :type force: bool
+        :return: None
+        """
+        now = time.monotonic()
+
+        if not force and now - self._synced_at < self.sync_interval:
+            return None
+
+        # Another thread is already syncing.
+        if not self._lock.acquire(blocking=False):
+            return None
+
+        try:
+            self._synced_at = now
+
+            pool = pool_stats.stats(db.engine.pool)
+            self._advance(DB_POOL_CHECKOUTS, "checkouts", pool["checkouts"])
+            self._advance(DB_POOL_TIMEOUTS, "timeouts", pool["timeouts"])
+            self._advance(DB_POOL_WAIT, "wait", pool["wait_total"])
+            DB_POOL_CHECKED_OUT.set(pool.get("checked_out", 0))
+            DB_POOL_OVERFLOW.set(max(pool.get("overflow", 0), 0))
+
+            for name, stats in (("user", user_cache.stats()),
+                                ("token", token_verifier.stats())):
+                for key, result in (("hits", "hit"), ("misses", "miss")):
+                    self._advance(CACHE_LOOKUPS.labels(name, result),
+                                  (name, key), stats[key])
+
+            passwords = password_hasher.stats()
+            self._advance(PASSWORD_VERIFICATIONS, "verified",
+                          passwords["verified"])
+            self._advance(PASSWORD_REJECTIONS, "rejected",
+                          passwords["rejected"])
+            PASSWORD_QUEUE_DEPTH.set(passwords["queue_depth"])
+            PASSWORD_IN_FLIGHT.set(passwords["in_flight"])
+
+            for latency in password_hasher.drain_latencies():
+                PASSWORD_LATENCY.observe(latency)
+        finally:
+            self._lock.release()
+
+        return None
+
+    def _advance(self, counter, key, value):
+        # Counters only go up, a stat that was reset starts over from 0.
+        delta = value - self._seen.get(key, 0)
+        self._seen[key] = value
+
+        if delta > 0:
+            counter.inc(delta)
+
+    def _before_request(self):
+        g.metrics_started_at = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    def _after_request(self, response):
+        started_at = g.get("metrics_started_at")
+
+        if started_at is not None:
+            labels = (request.endpoint or "unmatched", request.method,
+                      response.status_code)
+            latency = self._latency.get(labels)
+
+            # Looking up a labeled child costs more than observing it.
+            if latency is None:
+                latency = REQUEST_LATENCY.labels(*labels)
+                self._latency[labels] = latency
+
+            latency.observe(time.perf_counter() - started_at)
+
+        self.sync()
+
+        return response
+
+    def _teardown_request(self, exception=None):
+        if g.pop("metrics_started_at", None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
+
+
+metrics_recorder = MetricsRecorder()
+
+
+@before_task_publish.connect
+def count_enqueued_task(sender=None, **kwargs):
+    CELERY_TASKS_ENQUEUED.labels(sender).inc()
+
+
+_task_started_at = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+
+    if started_at is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started_at)
+
+
+@celeryd_init.connect
+def reset_worker_metrics(**kwargs):
+    reset_multiprocess_dir()
+
+
+@worker_ready.connect
+def serve_worker_metrics(sender=None, **kwargs):
+    # Task metrics live in the worker's processes, so the worker serves them
+    # itself rather than through the web app's scrape endpoint.
+    port = sender.app.conf.get("worker_metrics_port")
+
+    if port:
+        start_http_server(port, registry=registry())
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
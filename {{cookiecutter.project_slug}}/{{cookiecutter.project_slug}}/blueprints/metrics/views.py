@@ -0,0 +1,25 @@
+from flask import Blueprint, Response, current_app
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from {{ cookiecutter.project_slug }}.blueprints.metrics.recorder import (
+    metrics_recorder,
+    registry,
+)
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.get("/metrics")
+def index():
+    """Expose metrics of every worker in the Prometheus text format"""
+    metrics_recorder.sync(force=True)
+
+    output = generate_latest(registry())
+
+    try:
+        output += generate_latest(metrics_recorder.queue_depth)
+    except Exception:
+        current_app.logger.exception("Failed to read Celery queue depths")
+
+    return Response(output, mimetype=CONTENT_TYPE_LATEST)
@@ -1,17 +1,30 @@
+import hashlib
 import uuid
 
+from sqlalchemy import delete, select, update
 from sqlalchemy.dialects.postgresql import UUID
 
 from {{ cookiecutter.project_slug }}.extensions import db
-from lib.util_sqlalchemy import ResourceMixin
+from lib.util_datetime import tzware_datetime
+from lib.util_sqlalchemy import ResourceMixin, AwareDateTime
 
 
 class Token(ResourceMixin, db.Model):
-    """Model used for tracking refresh tokens"""
+    """
+    Model used for tracking refresh tokens.
+
+    Only a SHA-256 digest of each refresh token is stored. Every token issued
+    by rotating a refresh token belongs to the same family as the token it
+    replaced, so presenting an already used token revokes the whole family.
+    """
     __tablename__ = "tokens"
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    token = db.Column(db.Text, nullable=False)
-    token_expiration = db.Column(db.DateTime, nullable=False)
+    token_hash = db.Column(db.String(64), index=True, unique=True,
+                           nullable=False)
+    family_id = db.Column(UUID(as_uuid=True), index=True, nullable=False,
+                          default=uuid.uuid4)
+    token_expiration = db.Column(AwareDateTime(), index=True, nullable=False)
+    revoked_on = db.Column(AwareDateTime())
 
     # Relationships
     user_id = db.Column(
@@ -23,9 +36,91 @@ class Token(ResourceMixin, db.Model):
     user = db.relationship("User", back_populates="tokens")
 
     @classmethod
-    def create(cls, user, jwt, expiration):
+    def hash_token(cls, jwt):
+        """
+        Digest a refresh token so it can be stored and looked up.
+
+        :param jwt: str
+        :return: str
+        """
+        return hashlib.sha256(jwt.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def create(cls, user, jwt, expiration, family_id=None):
         return Token(
             user=user,
-            token=jwt,
+            token_hash=cls.hash_token(jwt),
+            family_id=family_id or uuid.uuid4(),
             token_expiration=expiration
         ).save()
+
+    @classmethod
+    def find_by_token(cls, jwt):
+        """
+        Find a refresh token through its unique digest index
+
+        :param jwt: str
+        :return: Token instance
+        """
+        return Token.query.filter(
+            Token.token_hash == cls.hash_token(jwt)).first()
+
+    @classmethod
+    def revoke_family(cls, family_id):
+        """
+        Revoke every token that was issued from the same login.
+
+        :param family_id: uuid
+        :return: Number of revoked tokens
+        """
+        result = db.session.execute(
+            update(Token)
+            .where(Token.family_id == family_id, Token.revoked_on.is_(None))
+            .values(revoked_on=tzware_datetime())
+        )
+        db.session.commit()
+
+        return result.rowcount
+
+    @classmethod
+    def prune_expired(cls, batch_size=1000):
+        """
+        Delete expired tokens in batches to keep each transaction short.
+
+        :param batch_size: Max amount of rows deleted per transaction
+        :type batch_size: int
+        :return: Number of deleted tokens
+        """
+        delete_count = 0
+
+        while True:
+            expired = (
+                select(Token.id)
+                .where(Token.token_expiration < tzware_datetime())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                delete(Token).where(Token.id.in_(expired)))
+            db.session.commit()
+
+            delete_count += result.rowcount
+
+            if result.rowcount < batch_size:
+                return delete_count
+
+    def use(self):
+        """
+        Atomically mark the token as used. This only succeeds once, even when
+        the same token is presented by concurrent requests.
+
+        :return: bool
+        """
+        result = db.session.execute(
+            update(Token)
+            .where(Token.id == self.id, Token.revoked_on.is_(None))
+            .values(revoked_on=tzware_datetime())
+        )
+        db.session.commit()
+
+        return result.rowcount == 1
@@ -10,8 +10,9 @@ class TokenSchema(ma.SQLAlchemySchema):
         ordered = True
 
     id = ma.auto_field(dump_only=True)
-    token = ma.auto_field(dump_only=True)
+    family_id = ma.auto_field(dump_only=True)
     token_expiration = ma.auto_field(dump_only=True)
+    revoked_on = ma.auto_field(dump_only=True)
 
 
 token_schema = TokenSchema()
@@ -24,3 +25,10 @@ class TokenRequestSchema(ma.Schema):
 
 
 token_request_schema = TokenRequestSchema()
+
+
+class TokenRefreshSchema(ma.Schema):
+    refresh_token = ma.String(required=True)
+
+
+token_refresh_schema = TokenRefreshSchema()
@@ -0,0 +1,9 @@
+from {{ cookiecutter.project_slug }}.app import celery_app as celery
+from {{ cookiecutter.project_slug }}.blueprints.token.models import Token
+
+
+# Pruning is safe to run twice, so it's only acknowledged once it's done and
+# a worker that dies halfway leaves it to another one.
+@celery.task(name="prune_expired_tokens", ignore_result=True, acks_late=True)
+def prune_expired_tokens(batch_size=1000):
+    return Token.prune_expired(batch_size=batch_size)
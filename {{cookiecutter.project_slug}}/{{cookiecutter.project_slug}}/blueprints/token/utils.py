@@ -1,8 +1,13 @@
-import jwt
+import uuid
+from datetime import datetime, timedelta
 
-from flask import current_app
+import jwt
+import pytz
+from flask import current_app, request
 
 from {{ cookiecutter.project_slug }}.extensions import token_auth
+from {{ cookiecutter.project_slug }}.blueprints.token.models import Token
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
 
 
 @token_auth.get_user_roles
@@ -31,12 +36,61 @@ def verify_token(token):
     :return: dict of decoded token data
     """
     try:
-        data = jwt.decode(
-            token,
-            current_app.config["JWT_SECRET_KEY"],
-            algorithms=["HS256"]
-        )
+        data = token_verifier.decode(token)
     except jwt.InvalidTokenError:
         return False
 
+    # Refresh tokens can only be exchanged for a new pair, not used for auth.
+    if data.get("type") == "refresh":
+        return False
+
     return data
+
+
+def issue_token_pair(user, family_id=None):
+    """
+    Create an access token and a refresh token for a user. Only a digest of
+    the refresh token is stored.
+
+    :param user: User
+    :param family_id: Token family of the refresh token being rotated
+    :return: dict
+    """
+    now = datetime.now(pytz.utc)
+    refresh_expiration = now + timedelta(
+        days=current_app.config["REFRESH_TOKEN_EXP"])
+
+    access_token = token_verifier.encode(
+        {
+            "sub": str(user.id),
+            "type": "access",
+            "email": user.email,
+            "role": user.role,
+            "iss": request.host,
+            "iat": now,
+            "exp": now +
+            timedelta(minutes=current_app.config["ACCESS_TOKEN_EXP"]),
+        }
+    )
+    refresh_token = token_verifier.encode(
+        {
+            "sub": str(user.id),
+            "type": "refresh",
+            "jti": uuid.uuid4().hex,
+            "iss": request.host,
+            "iat": now,
+            "exp": refresh_expiration,
+        }
+    )
+
+    Token.create(
+        user=user,
+        jwt=refresh_token,
+        expiration=refresh_expiration,
+        family_id=family_id,
+    )
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+    }
@@ -0,0 +1,137 @@
+import hashlib
+import time
+
+import jwt
+
+from lib.util_cache import LRUCache
+
+
+class TokenVerifier(object):
+    """
+    Sign and verify JWTs against a keyring of secrets identified by `kid`.
+
+    New tokens are always signed with the current key while retired keys keep
+    verifying the tokens they signed, so secrets can be rotated without
+    logging anyone out. Tokens without a `kid` header are checked against the
+    current key.
+
+    Decoded claims are cached by the token's SHA-256 digest until the token
+    expires, so a client re-using the same bearer token only pays for one
+    full decode. A cached token stops being accepted as soon as its key is
+    removed from the keyring.
+    """
+
+    ALGORITHM = "HS256"
+
+    def __init__(self, app=None):
+        self.keys = {}
+        self.current_kid = None
+        self.cache = LRUCache(maxsize=0)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Build the keyring from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.configure(
+            app.config["JWT_SECRET_KEY"],
+            kid=app.config.get("JWT_KEY_ID", "1"),
+            previous_keys=app.config.get("JWT_PREVIOUS_KEYS"),
+            maxsize=app.config.get("JWT_CACHE_MAXSIZE", 4096),
+            max_ttl=app.config.get("JWT_CACHE_MAX_TTL", 3600),
+        )
+
+        app.extensions["token_verifier"] = self
+
+        return None
+
+    def configure(self, secret, kid="1", previous_keys=None, maxsize=4096,
+                  max_ttl=3600):
+        """
+        Set the keyring and reset the claims cache.
+
+        :param secret: Secret used to sign new tokens
+        :param kid: Key id of the current secret
+        :param previous_keys: Retired keys as a dict or "kid:secret,..." str
+        :param maxsize: Max amount of decoded tokens to cache
+        :param max_ttl: Max seconds a decoded token is cached for
+        :return: None
+        """
+        if isinstance(previous_keys, str):
+            previous_keys = dict(
+                item.strip().split(":", 1)
+                for item in previous_keys.split(",")
+                if item.strip()
+            )
+
+        self.keys = dict(previous_keys or {})
+        self.keys[kid] = secret
+        self.current_kid = kid
+        self.cache = LRUCache(maxsize=maxsize, ttl=max_ttl)
+
+        return None
+
+    def encode(self, claims):
+        """
+        Sign a set of claims with the current key.
+
+        :param claims: dict
+        :return: str
+        """
+        return jwt.encode(
+            claims,
+            self.keys[self.current_kid],
+            algorithm=self.ALGORITHM,
+            headers={"kid": self.current_kid},
+        )
+
+    def decode(self, token):
+        """
+        Verify a token and return its claims.
+
+        :param token: str
+        :raises: jwt.InvalidTokenError if the token can't be trusted
+        :return: dict
+        """
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        cached = self.cache.get(digest)
+
+        if cached is not None:
+            kid, claims = cached
+
+            if kid in self.keys:
+                return claims
+
+            self.cache.delete(digest)
+
+        kid = jwt.get_unverified_header(token).get("kid", self.current_kid)
+        key = self.keys.get(kid)
+
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id: {kid}")
+
+        claims = jwt.decode(token, key, algorithms=[self.ALGORITHM])
+
+        ttl = self.cache.ttl
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - time.time())
+
+        self.cache.set(digest, (kid, claims), ttl=ttl)
+
+        return claims
+
+    def stats(self):
+        """
+        Report hit and miss counts of the claims cache.
+
+        :return: dict
+        """
+        return self.cache.stats()
+
+
+token_verifier = TokenVerifier()
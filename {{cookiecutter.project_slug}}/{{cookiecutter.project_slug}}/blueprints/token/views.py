@@ -1,12 +1,16 @@
 import jwt
-import pytz
-from datetime import datetime, timedelta
 
 from apifairy import body
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 
 from {{ cookiecutter.project_slug }}.blueprints.token.models import Token
-from {{ cookiecutter.project_slug }}.blueprints.token.schemas import token_request_schema
+from {{ cookiecutter.project_slug }}.blueprints.token.utils import issue_token_pair
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import PasswordHasherBusy
+from {{ cookiecutter.project_slug }}.blueprints.token.verifier import token_verifier
+from {{ cookiecutter.project_slug }}.blueprints.token.schemas import (
+    token_request_schema,
+    token_refresh_schema,
+)
 
 token = Blueprint("token", __name__, template_folder="templates")
 
@@ -18,41 +22,55 @@ def token_create(args):
     from {{ cookiecutter.project_slug }}.blueprints.user.models import User
     user = User.find_by_email(args.get("email"))
 
-    if not user or not user.authenticated(password=args.get("password")):
+    try:
+        authenticated = user is not None and user.authenticated(
+            password=args.get("password"))
+    except PasswordHasherBusy:
+        response = jsonify(success=False, message="Too many requests")
+        return response, 503, {"Retry-After": "1"}
+
+    if not authenticated:
         return jsonify(success=False, message="Wrong email or password")
 
     if not user.is_active():
         return jsonify(success=False, message="This account has been disabled")
 
-    refresh_expiration = datetime.now(
-        pytz.utc) + timedelta(days=current_app.config["REFRESH_TOKEN_EXP"])
-
-    access_token = jwt.encode(
-        {
-            "email": user.email,
-            "role": user.role,
-            "iss": request.host,
-            "iat": datetime.now(pytz.utc),
-            "exp": datetime.now(pytz.utc) +
-            timedelta(minutes=current_app.config["ACCESS_TOKEN_EXP"]),
-        },
-        current_app.config["JWT_SECRET_KEY"],
-        algorithm="HS256"
-    )
-    refresh_token = jwt.encode(
-        {
-            "iss": request.host,
-            "iat": datetime.now(pytz.utc),
-            "exp": refresh_expiration,
-        },
-        current_app.config["JWT_SECRET_KEY"],
-        algorithm="HS256"
-    )
-
     user.update_tracking_activity(request.remote_addr)
-    Token.create(user=user, jwt=refresh_token, expiration=refresh_expiration)
 
-    return jsonify(
-        access_token=access_token,
-        refresh_token=refresh_token,
-    )
+    return jsonify(**issue_token_pair(user))
+
+
+@token.route("/api/tokens/refresh", methods=["POST"])
+@body(token_refresh_schema)
+def token_refresh(args):
+    """Exchange a refresh token for a new JWT Token pair"""
+    refresh_token = args.get("refresh_token")
+
+    try:
+        claims = token_verifier.decode(refresh_token)
+    except jwt.InvalidTokenError:
+        claims = {}
+
+    if claims.get("type") != "refresh":
+        return jsonify(success=False, message="Invalid refresh token"), 401
+
+    # The JWT's own expiration was checked when it was decoded.
+    stored_token = Token.find_by_token(refresh_token)
+
+    if stored_token is None:
+        return jsonify(success=False, message="Invalid refresh token"), 401
+
+    family_id = stored_token.family_id
+
+    if not stored_token.use():
+        # A refresh token can only be used once, seeing it again means it may
+        # have leaked so every token issued from the same login is revoked.
+        Token.revoke_family(family_id)
+        return jsonify(success=False, message="Refresh token was revoked"), 401
+
+    user = stored_token.user
+
+    if user is None or user.is_removed or not user.is_active():
+        return jsonify(success=False, message="This account has been disabled")
+
+    return jsonify(**issue_token_pair(user, family_id=family_id))
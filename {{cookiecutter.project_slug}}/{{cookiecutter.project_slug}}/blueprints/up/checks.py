@@ -0,0 +1,139 @@
+import threading
+import time
+
+import redis
+from kombu import Connection
+from sqlalchemy import text
+
+from {{ cookiecutter.project_slug }}.extensions import db
+
+
+class DependencyCheck(object):
+    """
+    Check whether 1 dependency is reachable and remember the result for `ttl`
+    seconds.
+
+    Only 1 thread per process runs the check at a time. Other threads serve
+    the last result while it runs, and only wait for it the first time,
+    before there is any result to serve.
+    """
+
+    def __init__(self, name, probe, ttl=5):
+        self.name = name
+        self.probe = probe
+        self.ttl = ttl
+
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def result(self):
+        """
+        Return the cached result, refreshing it when it's older than the TTL.
+
+        :return: dict
+        """
+        if self._result is not None \
+                and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+
+        try:
+            # Another thread may have refreshed it while we waited.
+            if self._result is None \
+                    or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = self._run()
+                self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+        return self._result
+
+    def _run(self):
+        started_at = time.perf_counter()
+        error = None
+
+        try:
+            self.probe()
+        except Exception as e:
+            error = "{0}: {1}".format(type(e).__name__, e)
+
+        result = {
+            "ok": error is None,
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        }
+
+        if error:
+            result["error"] = error
+
+        return result
+
+
+class ReadinessChecks(object):
+    """
+    Deep health check of everything a request or task depends on: Postgres,
+    Redis and the Celery broker.
+
+    Results are cached for UP_READY_TTL seconds in each worker, so a load
+    balancer polling every worker doesn't turn into a steady stream of
+    connections to each dependency.
+    """
+
+    def __init__(self, app=None):
+        self.checks = []
+        self.redis = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Build the checks from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        ttl = app.config.get("UP_READY_TTL", 5)
+        timeout = app.config.get("UP_READY_TIMEOUT", 2)
+
+        self.redis = redis.Redis.from_url(
+            app.config["REDIS_URL"],
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+        )
+        broker_url = app.config.get("CELERY_CONFIG", {}).get("broker_url")
+
+        def check_postgres():
+            with db.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+        def check_broker():
+            with Connection(broker_url, connect_timeout=timeout) as broker:
+                broker.ensure_connection(max_retries=0)
+
+        self.checks = [
+            DependencyCheck("postgres", check_postgres, ttl),
+            DependencyCheck("redis", self.redis.ping, ttl),
+        ]
+
+        if broker_url:
+            self.checks.append(DependencyCheck("broker", check_broker, ttl))
+
+        app.extensions["readiness_checks"] = self
+
+        return None
+
+    def results(self):
+        """
+        Return every dependency's latest result.
+
+        :return: tuple of (ok, dict of results by name)
+        """
+        results = {check.name: check.result() for check in self.checks}
+
+        return all(result["ok"] for result in results.values()), results
+
+
+readiness_checks = ReadinessChecks()
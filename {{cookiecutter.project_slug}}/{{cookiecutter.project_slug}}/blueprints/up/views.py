@@ -1,4 +1,6 @@
-from flask import Blueprint
+from flask import Blueprint, jsonify
+
+from {{ cookiecutter.project_slug }}.blueprints.up.checks import readiness_checks
 
 up = Blueprint("up", __name__, template_folder="templates", url_prefix="/up")
 
@@ -6,3 +8,11 @@ up = Blueprint("up", __name__, template_folder="templates", url_prefix="/up")
 @up.get("/")
 def index():
     return "Application is up"
+
+
+@up.get("/ready")
+def ready():
+    ok, checks = readiness_checks.results()
+    status = "ok" if ok else "unavailable"
+
+    return jsonify(status=status, checks=checks), 200 if ok else 503
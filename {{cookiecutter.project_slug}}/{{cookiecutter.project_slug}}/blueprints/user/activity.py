@@ -0,0 +1,189 @@
+import atexit
+import os
+import threading
+
+from sqlalchemy import bindparam
+
+from lib.util_datetime import tzware_datetime
+from {{ cookiecutter.project_slug }}.extensions import db
+from {{ cookiecutter.project_slug }}.blueprints.user.cache import user_cache
+
+
+class ActivityTracker(object):
+    """
+    Record sign in activity without a read-modify-write of the user.
+
+    Every sign in is written with an atomic `sign_in_count + n` UPDATE, so
+    concurrent logins for the same account never lose an increment.
+
+    In "buffered" mode sign ins are coalesced per user in memory and a
+    background thread writes them in bulk every USER_ACTIVITY_FLUSH_INTERVAL
+    seconds, or sooner once USER_ACTIVITY_MAX_BATCH users are waiting. Logins
+    don't pay for a transaction, at the cost of losing up to one interval of
+    activity if a worker is killed. "sync" mode writes each sign in right
+    away and is what the test suite uses.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = "sync"
+        self.interval = 5
+        self.max_batch = 500
+
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read the tracking mode from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.app = app
+        self.mode = app.config.get("USER_ACTIVITY_TRACKING", "sync")
+        self.interval = app.config.get("USER_ACTIVITY_FLUSH_INTERVAL", 5)
+        self.max_batch = app.config.get("USER_ACTIVITY_MAX_BATCH", 500)
+
+        app.extensions["activity_tracker"] = self
+
+        return None
+
+    def track(self, user_id, ip_address):
+        """
+        Record a sign in.
+
+        :param user_id: User id
+        :param ip_address: IP address the user signed in from
+        :return: None
+        """
+        signed_in_on = tzware_datetime()
+
+        if self.mode != "buffered":
+            self.write({user_id: [1, None, None, signed_in_on, ip_address]})
+            return None
+
+        self._ensure_flusher()
+
+        with self._lock:
+            entry = self._buffer.get(user_id)
+
+            if entry is None:
+                self._buffer[user_id] = [
+                    1, None, None, signed_in_on, ip_address]
+            else:
+                # The previous sign in within this batch becomes the last one.
+                entry[0] += 1
+                entry[1], entry[2] = entry[3], entry[4]
+                entry[3], entry[4] = signed_in_on, ip_address
+
+            if len(self._buffer) >= self.max_batch:
+                self._wakeup.set()
+
+        return None
+
+    def flush(self):
+        """
+        Write every buffered sign in.
+
+        :return: Number of users updated
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, {}
+
+        if not entries:
+            return 0
+
+        with self.app.app_context():
+            try:
+                self.write(entries)
+            except Exception:
+                self.app.logger.exception("Failed to write sign in activity")
+                db.session.rollback()
+                return 0
+
+        return len(entries)
+
+    def write(self, entries):
+        """
+        Apply coalesced sign ins with 1 bulk UPDATE per kind of entry.
+
+        :param entries: dict of user id to
+            [count, previous_on, previous_ip, current_on, current_ip]
+        :return: None
+        """
+        from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+
+        users = User.__table__
+        single, multiple = [], []
+
+        for user_id, (count, prev_on, prev_ip, on, ip) in entries.items():
+            params = {
+                "user_id": user_id,
+                "count": count,
+                "prev_on": prev_on,
+                "prev_ip": prev_ip,
+                "on": on,
+                "ip": ip,
+            }
+            (multiple if count > 1 else single).append(params)
+
+        statement = users.update().where(
+            users.c.id == bindparam("user_id"))
+        values = {
+            "sign_in_count": users.c.sign_in_count + bindparam("count"),
+            "current_sign_in_on": bindparam("on"),
+            "current_sign_in_ip": bindparam("ip"),
+        }
+
+        # Postgres evaluates every SET against the old row, so a single sign
+        # in moves the current values into last_* in the same statement.
+        if single:
+            db.session.execute(statement.values(
+                last_sign_in_on=users.c.current_sign_in_on,
+                last_sign_in_ip=users.c.current_sign_in_ip,
+                **values), single)
+
+        if multiple:
+            db.session.execute(statement.values(
+                last_sign_in_on=bindparam("prev_on"),
+                last_sign_in_ip=bindparam("prev_ip"),
+                **values), multiple)
+
+        db.session.commit()
+        user_cache.invalidate(*entries.keys())
+
+        return None
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork, so each worker starts its own.
+        if self._pid == os.getpid():
+            return None
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return None
+
+            self._pid = os.getpid()
+            self._buffer = {}
+
+            thread = threading.Thread(
+                target=self._run, name="activity-flusher", daemon=True)
+            thread.start()
+            atexit.register(self.flush)
+
+        return None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+activity_tracker = ActivityTracker()
@@ -0,0 +1,159 @@
+import redis
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from lib.util_cache import LRUCache, RedisCache
+from {{ cookiecutter.project_slug }}.extensions import db
+
+
+class UserCache(object):
+    """
+    Identity cache that sits in front of Flask-Login's user loader so an
+    authenticated page view doesn't need a database round trip to learn who
+    the user is.
+
+    Users are cached as a snapshot of their column values (minus the password
+    hash) in a per-process LRU and, optionally, in Redis so every worker can
+    share it. A snapshot is turned back into a persistent instance with
+    `session.merge(load=False)`, which doesn't emit any SQL.
+
+    Local entries in other processes are only dropped when their TTL runs out,
+    so keep USER_CACHE_TTL short.
+    """
+
+    EXCLUDE = ("password",)
+
+    def __init__(self, app=None):
+        self.local = LRUCache(maxsize=0)
+        self.shared = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache tiers from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        ttl = app.config.get("USER_CACHE_TTL", 60)
+
+        self.local = LRUCache(
+            maxsize=app.config.get("USER_CACHE_MAXSIZE", 1024), ttl=ttl)
+        self.shared = None
+
+        if app.config.get("USER_CACHE_REDIS"):
+            client = redis.Redis.from_url(app.config["REDIS_URL"])
+            self.shared = RedisCache(client, prefix="user", ttl=ttl)
+
+        app.extensions["user_cache"] = self
+
+        return None
+
+    def load(self, user_id, user_model):
+        """
+        Return a user, preferably without touching the database.
+
+        :param user_id: User id as stored in the session
+        :param user_model: Model used to look the user up on a cache miss
+        :return: User instance or None
+        """
+        key = str(user_id)
+        snapshot = self.local.get(key)
+
+        if snapshot is None and self.shared is not None:
+            snapshot = self.shared.get(key)
+
+            if snapshot is not None:
+                self.local.set(key, snapshot)
+
+        if snapshot is not None:
+            return self._restore(user_model, snapshot)
+
+        user = user_model.find_by_id(user_id)
+
+        if user is not None:
+            self.set(user)
+
+        return user
+
+    def set(self, user):
+        """
+        Cache a snapshot of a user.
+
+        :param user: User instance
+        :return: None
+        """
+        key = str(user.id)
+        snapshot = self._snapshot(user)
+
+        self.local.set(key, snapshot)
+
+        if self.shared is not None:
+            self.shared.set(key, snapshot)
+
+        return None
+
+    def invalidate(self, *user_ids):
+        """
+        Drop 1 or more users from every cache tier.
+
+        :param user_ids: User ids
+        :return: None
+        """
+        keys = [str(user_id) for user_id in user_ids]
+
+        self.local.delete(*keys)
+
+        if self.shared is not None:
+            self.shared.delete(*keys)
+
+        return None
+
+    def clear(self):
+        """
+        Empty the local tier and reset its counters.
+
+        :return: None
+        """
+        self.local.clear()
+
+        return None
+
+    def stats(self):
+        """
+        Report hit and miss counts across both tiers.
+
+        :return: dict
+        """
+        local = self.local.stats()
+        shared = self.shared.stats() if self.shared is not None else {}
+        hits = local["hits"] + shared.get("hits", 0)
+
+        return {
+            "hits": hits,
+            "misses": self.local.misses - shared.get("hits", 0),
+            "local": local,
+            "redis": shared,
+        }
+
+    def _snapshot(self, user):
+        mapper = inspect(user).mapper
+
+        return {
+            attr.key: getattr(user, attr.key)
+            for attr in mapper.column_attrs
+            if attr.key not in self.EXCLUDE
+        }
+
+    def _restore(self, user_model, snapshot):
+        user = user_model(**snapshot)
+
+        # Excluded columns are marked as expired and lazy load if accessed.
+        make_transient_to_detached(user)
+
+        return db.session.merge(user, load=False)
+
+
+user_cache = UserCache()
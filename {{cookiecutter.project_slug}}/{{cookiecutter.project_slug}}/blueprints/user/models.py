@@ -1,32 +1,46 @@
 import uuid
-import pytz
-import datetime
 from collections import OrderedDict
 
+from celery import group
 from flask import current_app
 from flask_login import UserMixin
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import DDL, event, func, or_, select, true
+from sqlalchemy.dialects.postgresql import UUID, insert
 from itsdangerous.url_safe import URLSafeTimedSerializer
 from itsdangerous import BadData, BadSignature, SignatureExpired
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from {{ cookiecutter.project_slug }}.extensions import db
+from {{ cookiecutter.project_slug }}.blueprints.user.cache import user_cache
+from {{ cookiecutter.project_slug }}.blueprints.user.activity import activity_tracker
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import password_hasher
 from lib.util_sqlalchemy import (
     ResourceMixin,
     AwareDateTime,
-    SoftDeleteQueryManager,
+    SoftDeleteMixin,
+    SoftDeleteQuery,
 )
 
 
-class User(UserMixin, ResourceMixin, db.Model):
+class User(UserMixin, SoftDeleteMixin, ResourceMixin, db.Model):
     ROLE = OrderedDict([
         ("admin", "Admin"),
         ("member", "Member"),
     ])
 
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination seeks through (created_on, id).
+        db.Index("ix_users_created_on_id", "created_on", "id"),
+        # Trigram indexes serve `search` for any part of an email or name.
+        db.Index("ix_users_email_trgm", "email", postgresql_using="gin",
+                 postgresql_ops={"email": "gin_trgm_ops"}),
+        db.Index("ix_users_name_trgm", "name", postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = db.Column(db.String(255), index=True, unique=True)
+    # Unique regardless of case through uq_users_email_lower, see below.
+    email = db.Column(db.String(255))
     password = db.Column(db.String(255))
     name = db.Column(db.String(255))
     role = db.Column(
@@ -37,7 +51,6 @@ class User(UserMixin, ResourceMixin, db.Model):
     )
     active = db.Column('is_active', db.Boolean(), nullable=False,
                        server_default='1')
-    is_removed = db.Column(db.Boolean(), default=False, nullable=False)
 
     # Activity Tracking
     sign_in_count = db.Column(db.Integer, nullable=False, default=0)
@@ -49,8 +62,12 @@ class User(UserMixin, ResourceMixin, db.Model):
     # Relationships
     tokens = db.relationship("Token", back_populates="user")
 
-    # Custom query class to decorate model with soft-delete functionality
-    query_class = SoftDeleteQueryManager
+    # Lets `User.query.with_deleted()` include soft deleted users.
+    query_class = SoftDeleteQuery
+
+    # Columns written by `export`, the password hash is never exported.
+    EXPORT_FIELDS = ("id", "email", "name", "role", "active", "sign_in_count",
+                     "last_sign_in_on", "created_on")
 
     @classmethod
     def find_by_id(cls, id):
@@ -60,28 +77,113 @@ class User(UserMixin, ResourceMixin, db.Model):
         :param id:
         :return: User instance
         """
-        return User.query.get(id)
+        return User.get_by_id(id)
 
     @classmethod
     def find_by_email(cls, email):
         """
-        Find a user by their email
+        Find a user by their email, regardless of its case
 
         :param email:
         :return: User instance
         """
-        return User.query.filter(User.email == email).first()
+        email = cls.normalize_email(email)
+
+        return User.query.filter(func.lower(User.email) == email).first()
+
+    @classmethod
+    def normalize_email(cls, email):
+        """
+        Normalize an email the same way uq_users_email_lower indexes it.
+
+        :param email: Email
+        :type email: str
+        :return: str
+        """
+        if email is None:
+            return None
+
+        return email.strip().lower()
+
+    @classmethod
+    def search(cls, query):
+        """
+        Search a resource by 1 or more fields. The LIKE patterns are served by
+        the trigram indexes so they don't scan the table, although queries
+        shorter than 3 characters can't be narrowed down much by them.
+
+        :param query: Search query
+        :type query: str
+        :return: SQLAlchemy filter
+        """
+        if not query:
+            return true()
+
+        query = (query.replace("\\", "\\\\")
+                 .replace("%", "\\%")
+                 .replace("_", "\\_"))
+        search_query = "%{0}%".format(query)
+        search_chain = (User.email.ilike(search_query, escape="\\"),
+                        User.name.ilike(search_query, escape="\\"))
+
+        return or_(*search_chain)
+
+    @classmethod
+    def search_rank(cls, query):
+        """
+        Rank how well a user matches a search query, from 0 to 1.
+
+        :param query: Search query
+        :type query: str
+        :return: SQLAlchemy expression
+        """
+        return func.greatest(func.word_similarity(query, User.email),
+                             func.word_similarity(query, User.name))
+
+    @classmethod
+    def on_bulk_action(cls, ids):
+        """
+        Override `ResourceMixin` on_bulk_action to drop the affected users
+        from the identity cache.
+
+        :param ids: List of affected ids
+        :type ids: list
+        :return: None
+        """
+        user_cache.invalidate(*ids)
+
+        return None
+
+    @classmethod
+    def export(cls, batch_size=1000):
+        """
+        Stream every user that isn't soft deleted through a server side
+        cursor, fetching `batch_size` rows at a time. Only the exported
+        columns are selected so no ORM instances pile up in the session.
+
+        :param batch_size: Amount of rows fetched per round trip
+        :type batch_size: int
+        :return: SQLAlchemy result
+        """
+        columns = [getattr(User, field) for field in cls.EXPORT_FIELDS]
+        query = (
+            select(*columns)
+            .order_by(User.created_on, User.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        return db.session.execute(query)
 
     @classmethod
     def encrypt_password(cls, plaintext_passwd):
         """
-        Hash a plaintext string using PBKDF2
+        Hash a plaintext string using the configured PASSWORD_HASH_METHOD
 
         :param paintext_passwd: password in plain text
         :return: str
         """
         if plaintext_passwd:
-            return generate_password_hash(plaintext_passwd)
+            return password_hasher.hash(plaintext_passwd)
 
         return None
 
@@ -119,6 +221,73 @@ class User(UserMixin, ResourceMixin, db.Model):
 
         return user
 
+    @classmethod
+    def invite_many(cls, emails):
+        """
+        Create an inactive user for every email that doesn't belong to a user
+        yet. Existing users are found with 1 query and the new ones are
+        inserted with multi-row INSERTs, skipping any email a concurrent
+        request took in the meantime.
+
+        :param emails: Unique emails, normalized with `normalize_email`
+        :type emails: list
+        :return: dict of email to the new user's id, for each invited email
+        """
+        if not emails:
+            return {}
+
+        email = func.lower(User.email)
+        existing = set(db.session.scalars(
+            select(email).where(email.in_(emails))))
+        rows = [
+            {
+                "email": address,
+                "password": cls.set_unusable_password(),
+                "active": False,
+            }
+            for address in emails if address not in existing
+        ]
+
+        if not rows:
+            return {}
+
+        statement = (
+            insert(User)
+            .on_conflict_do_nothing(
+                index_elements=[email], index_where=User.is_removed.is_(False))
+            .returning(User.id, User.email)
+        )
+        invited = db.session.execute(statement, rows).all()
+        db.session.commit()
+
+        return {address: user_id for user_id, address in invited}
+
+    @classmethod
+    def initialize_registrations(cls, user_ids, batch_size=100):
+        """
+        Initiate the registration flow of many invited members, as a group of
+        tasks which each email a batch of them.
+
+        :param user_ids: Ids of the invited users
+        :type user_ids: list
+        :param batch_size: Amount of emails sent per task
+        :type batch_size: int
+        :return: None
+        """
+        from {{ cookiecutter.project_slug }}.blueprints.invite.tasks import (
+            deliver_registration_emails,
+        )
+
+        user_ids = [str(user_id) for user_id in user_ids]
+        batches = [user_ids[i:i + batch_size]
+                   for i in range(0, len(user_ids), batch_size)]
+
+        if batches:
+            group(deliver_registration_emails.s(batch)
+                  for batch in batches).delay()
+
+        return None
+
     @classmethod
     def deserialize_token(cls, token, expiration=3600):
         """
@@ -139,43 +308,45 @@ class User(UserMixin, ResourceMixin, db.Model):
     @classmethod
     def set_unusable_password(cls):
         """
-        Create a password for users before they finish the registration process
+        Create a password for users before they finish the registration
+        process. It's a sentinel that never verifies, so no hashing is needed.
 
         :return: str
         """
-        return generate_password_hash(
-            current_app.config.get("USER_UNUSABLE_PASSWORD"))
+        return password_hasher.unusable()
 
     def authenticated(self, with_password=True, password=""):
         """
-        Ensure a user is authenticated, and optionally check their password
+        Ensure a user is authenticated, and optionally check their password.
+        A password hashed with an outdated method or cost is transparently
+        rehashed once it has been verified.
 
         :param with_password: optionally check the user password
         :param password: password to verify
         :return: bool
         """
-        if with_password:
-            return check_password_hash(self.password, password)
+        if not with_password:
+            return True
+
+        if not password_hasher.verify(self.password, password):
+            return False
+
+        if password_hasher.needs_rehash(self.password):
+            self.password = password_hasher.hash(password)
+            self.save()
 
         return True
 
     def update_tracking_activity(self, ip_address):
         """
         Update various fields on the user that are related to meta
-        data on their account
+        data on their account. Depending on USER_ACTIVITY_TRACKING this is
+        written right away or batched with other sign ins.
 
         :param ip_address:
-        :return: SQLAchemy commit results
+        :return: None
         """
-        self.sign_in_count += 1
-
-        self.last_sign_in_on = self.current_sign_in_on
-        self.last_sign_in_ip = self.current_sign_in_ip
-
-        self.current_sign_in_on = datetime.datetime.now(pytz.utc)
-        self.current_sign_in_ip = ip_address
-
-        return self.save()
+        return activity_tracker.track(self.id, ip_address)
 
     def serialize_token(self):
         """
@@ -198,11 +369,39 @@ class User(UserMixin, ResourceMixin, db.Model):
         """
         return self.active
 
-    def delete(self):
+    def save(self):
         """
-        Override `ResourceMixin` delete. This soft deletes the user instance
+        Override `ResourceMixin` save to drop the user from the identity cache
+        so the next request loads the new values.
 
         :return: User
         """
-        self.is_removed = True
-        self.save()
+        # Read the id before committing, afterwards it's expired and reading
+        # it would cost another query. New users aren't cached yet anyway.
+        user_id = self.id
+
+        super(User, self).save()
+
+        if user_id is not None:
+            user_cache.invalidate(user_id)
+
+        return self
+
+
+# Emails are unique regardless of case among users that aren't soft deleted,
+# so a removed user's email can sign up again. This also serves the lookups
+# of `find_by_email`, which filter on the same expression and predicate.
+db.Index(
+    "uq_users_email_lower",
+    func.lower(User.email),
+    unique=True,
+    postgresql_where=User.is_removed.is_(False),
+)
+
+# The trigram indexes need pg_trgm, which `db.create_all` doesn't install.
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(
+        dialect="postgresql"),
+)
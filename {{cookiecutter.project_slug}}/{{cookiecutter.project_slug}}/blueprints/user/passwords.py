@@ -0,0 +1,278 @@
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the verification pool and its queue are both full.
+    """
+
+
+class PasswordHasher(object):
+    """
+    Hash and verify passwords with a configurable Werkzeug method such as
+    "pbkdf2:sha256:600000" or "scrypt:32768:8:1".
+
+    Hashes remember the method and cost they were created with, so old hashes
+    keep verifying after PASSWORD_HASH_METHOD changes and `needs_rehash` tells
+    when a hash should be upgraded.
+
+    Unusable passwords are a random string behind a "!" prefix, which can't be
+    produced by any hash method, so creating and rejecting them is free.
+
+    When PASSWORD_VERIFY_POOL_SIZE is set, verifications run in a bounded
+    thread pool (hashlib releases the GIL while hashing) which caps how many
+    hashes a worker computes at once. Once the pool and its queue of
+    PASSWORD_VERIFY_QUEUE_SIZE are full, `verify` raises PasswordHasherBusy
+    right away instead of letting a burst of logins pile up.
+    """
+
+    UNUSABLE_PREFIX = "!"
+
+    # Latencies kept for metrics between 2 drains, older ones are dropped.
+    LATENCY_BUFFER = 1000
+
+    # Werkzeug's defaults for methods that leave out their cost parameters.
+    DEFAULTS = {
+        "pbkdf2": ["sha256", "600000"],
+        "scrypt": ["32768", "8", "1"],
+    }
+
+    def __init__(self, app=None):
+        self.method = self.normalize("pbkdf2")
+        self.salt_length = 16
+        self.pool_size = 0
+        self.queue_size = 0
+
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.verified = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+        self._latencies = deque(maxlen=self.LATENCY_BUFFER)
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read the hash method and salt length from the app's config.
+
+        :param app: Flask application instance
+        :return: None
+        """
+        self.method = self.normalize(
+            app.config.get("PASSWORD_HASH_METHOD", "pbkdf2"))
+        self.salt_length = app.config.get("PASSWORD_SALT_LENGTH", 16)
+        self.configure_pool(
+            app.config.get("PASSWORD_VERIFY_POOL_SIZE", 0),
+            app.config.get("PASSWORD_VERIFY_QUEUE_SIZE", 0),
+        )
+
+        app.extensions["password_hasher"] = self
+
+        return None
+
+    def configure_pool(self, pool_size, queue_size=0):
+        """
+        Size the verification pool, a pool size of 0 verifies inline.
+
+        :param pool_size: Max amount of concurrent verifications
+        :type pool_size: int
+        :param queue_size: Max amount of verifications waiting for the pool
+        :type queue_size: int
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self._executor = None
+        self._slots = None
+
+        if pool_size > 0:
+            self._slots = threading.BoundedSemaphore(pool_size + queue_size)
+
+        return None
+
+    @classmethod
+    def normalize(cls, method):
+        """
+        Fill in the default cost parameters of a hash method so it matches
+        the prefix Werkzeug writes into the hashes it creates.
+
+        :param method: str
+        :return: str
+        """
+        name, *params = method.split(":")
+        defaults = cls.DEFAULTS.get(name, [])
+
+        return ":".join([name] + params + defaults[len(params):])
+
+    def hash(self, password, method=None):
+        """
+        Hash a plaintext password.
+
+        :param password: str
+        :param method: Hash method, defaults to the configured one
+        :return: str
+        """
+        return generate_password_hash(
+            password,
+            method=method or self.method,
+            salt_length=self.salt_length,
+        )
+
+    def verify(self, pwhash, password):
+        """
+        Check a plaintext password against a hash.
+
+        :param pwhash: str
+        :param password: str
+        :return: bool
+        """
+        if not self.is_usable(pwhash):
+            return False
+
+        if self._slots is None:
+            return self._verify(pwhash, password, time.perf_counter())
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+
+            raise PasswordHasherBusy()
+
+        try:
+            # The executor is created on first use so it's never inherited by
+            # a forked worker.
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.pool_size,
+                            thread_name_prefix="password-verify",
+                        )
+
+            with self._lock:
+                self.queued += 1
+
+            return self._executor.submit(
+                self._verify, pwhash, password, time.perf_counter(), True
+            ).result()
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """
+        Report queue depth and verification latency. Latency is measured from
+        the moment a verification is requested, so it includes queueing.
+
+        :return: dict
+        """
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.queued,
+                "rejected": self.rejected,
+                "verified": self.verified,
+                "latency_avg": self.latency_sum / max(self.verified, 1),
+                "latency_max": self.latency_max,
+            }
+
+    def drain_latencies(self):
+        """
+        Return the latency of every verification since the last drain, so
+        they can be observed into a histogram.
+
+        :return: list of seconds
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            self._latencies.clear()
+
+        return latencies
+
+    def _verify(self, pwhash, password, requested_at, queued=False):
+        with self._lock:
+            self.in_flight += 1
+
+            if queued:
+                self.queued -= 1
+
+        try:
+            return check_password_hash(pwhash, password)
+        finally:
+            latency = time.perf_counter() - requested_at
+
+            with self._lock:
+                self.in_flight -= 1
+                self.verified += 1
+                self.latency_sum += latency
+                self.latency_max = max(self.latency_max, latency)
+                self._latencies.append(latency)
+
+    def needs_rehash(self, pwhash):
+        """
+        Return whether or not a hash was made with another method or cost
+        than the one currently configured.
+
+        :param pwhash: str
+        :return: bool
+        """
+        if not self.is_usable(pwhash):
+            return False
+
+        return pwhash.split("$", 1)[0] != self.method
+
+    def unusable(self):
+        """
+        Create a password hash that never verifies.
+
+        :return: str
+        """
+        return self.UNUSABLE_PREFIX + secrets.token_hex(20)
+
+    def is_usable(self, pwhash):
+        """
+        Return whether or not a hash can ever verify a password.
+
+        :param pwhash: str
+        :return: bool
+        """
+        return bool(pwhash) and not pwhash.startswith(self.UNUSABLE_PREFIX)
+
+    def benchmark(self, seconds=1.0, method=None):
+        """
+        Measure how many hashes a single worker can compute per second.
+
+        :param seconds: How long to keep hashing for
+        :type seconds: float
+        :param method: Hash method, defaults to the configured one
+        :return: float
+        """
+        method = self.normalize(method) if method else self.method
+        count = 0
+        started_at = time.perf_counter()
+
+        while True:
+            self.hash("benchmark-password", method=method)
+            count += 1
+            elapsed = time.perf_counter() - started_at
+
+            if elapsed >= seconds:
+                return count / elapsed
+
+
+password_hasher = PasswordHasher()
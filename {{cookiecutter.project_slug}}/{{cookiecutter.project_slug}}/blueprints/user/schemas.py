@@ -1,5 +1,7 @@
 from marshmallow import validate
 
+from lib.util_export import EXPORT_FORMATS
+from lib.util_schema import PaginationArgsSchema, PaginationSchema
 from {{ cookiecutter.project_slug }}.extensions import marshmallow as ma
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
 
@@ -22,6 +24,33 @@ user_schema = UserSchema()
 users_schema = UserSchema(many=True)
 
 
+class UserListArgsSchema(PaginationArgsSchema):
+    model = User
+
+    q = ma.String()
+    role = ma.String(validate=[validate.OneOf(User.ROLE)])
+    active = ma.Boolean()
+
+
+user_list_args_schema = UserListArgsSchema()
+
+
+class UserExportArgsSchema(ma.Schema):
+    format = ma.String(
+        load_default="ndjson", validate=[validate.OneOf(EXPORT_FORMATS)])
+
+
+user_export_args_schema = UserExportArgsSchema()
+
+
+class UserPageSchema(ma.Schema):
+    data = ma.Nested(UserSchema, many=True)
+    pagination = ma.Nested(PaginationSchema)
+
+
+user_page_schema = UserPageSchema()
+
+
 class PasswordResetSchema(ma.Schema):
     email = ma.String(required=True, validate=[validate.Email()])
 
@@ -4,8 +4,10 @@ from flask_login import login_user, logout_user
 from apifairy import response, authenticate, body
 
 from lib.safe_next_url import safe_next_url
+from lib.util_conditional import conditional_get
 from lib.util_schema import api_message_schema
 from {{ cookiecutter.project_slug }}.blueprints.user.models import User
+from {{ cookiecutter.project_slug }}.blueprints.user.passwords import PasswordHasherBusy
 from {{ cookiecutter.project_slug }}.blueprints.token.utils import token_auth
 from {{ cookiecutter.project_slug }}.blueprints.user.decorators import anonymous_required
 from {{ cookiecutter.project_slug }}.blueprints.user.schemas import user_schema, password_reset_schema
@@ -28,8 +30,17 @@ user = Blueprint("user", __name__, template_folder="templates")
 @response(user_schema)
 def user_info():
     """Current User"""
-    email = token_auth.current_user()["email"]
-    user = User.find_by_email(email)
+    claims = token_auth.current_user()
+
+    # Tokens carry the user's id so this is a primary key lookup. Tokens
+    # issued before the id was added only have the email.
+    if "sub" in claims:
+        user = User.find_by_id(claims["sub"])
+    else:
+        user = User.find_by_email(claims["email"])
+
+    if user is not None:
+        conditional_get.check(user.id, user.updated_on)
 
     return user
 
@@ -60,7 +71,14 @@ def login():
     if form.validate_on_submit():
         user = User.find_by_email(email=form.email.data)
 
-        if user is None or not user.authenticated(password=form.password.data):
+        try:
+            authenticated = user is not None and user.authenticated(
+                password=form.password.data)
+        except PasswordHasherBusy:
+            flash("Too many people are signing in, try again shortly", "error")
+            return render_template("user/login.html", form=form), 503
+
+        if not authenticated:
             flash("Email or password incorrect", "error")
             return redirect(url_for("user.login"))
 
@@ -7,7 +7,13 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from flask_debugtoolbar import DebugToolbarExtension
 
-db = SQLAlchemy()
+from lib.util_pool import TimedQueuePool
+from lib.util_replica import RoutingSession
+
+db = SQLAlchemy(
+    engine_options={"poolclass": TimedQueuePool},
+    session_options={"class_": RoutingSession},
+)
 flask_static_digest = FlaskStaticDigest()
 marshmallow = Marshmallow()
 apifairy = APIFairy()